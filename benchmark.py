@@ -1,35 +1,76 @@
 #!/usr/bin/env python
 
+import collections
+import concurrent.futures
+import getopt
 import glob
+import multiprocessing
 import numpy
+import os
 import PIL
 import PIL.Image
-import skimage
-import skimage.metrics
-import torch
+import sys
 
-import run
+import metrics
 
 ##########################################################
 
-run.arguments_strModel = 'paper'
+arguments_strModel = 'paper'
+arguments_strPrecision = 'float32'
+
+arguments_intWorkers = min(4, os.cpu_count() or 1) # processes that compute the metrics while the next samples are being estimated, few since they compete with the network for the cores
 
 ##########################################################
 
 if __name__ == '__main__':
+    import torch # only imported here since the spawned workers import this file as well, they only need metrics
+
+    import run
+
+    for strOption, strArgument in getopt.getopt(sys.argv[1:], '', [strParameter[2:] + '=' for strParameter in sys.argv[1::2]])[0]:
+        if strOption == '--model' and strArgument != '': arguments_strModel = strArgument # which model to use
+        if strOption == '--precision' and strArgument != '': arguments_strPrecision = strArgument # whether to run the u-net and the kernel heads in float32 or bfloat16, to measure the accuracy of the mixed-precision mode
+        if strOption == '--workers' and strArgument != '': arguments_intWorkers = int(strArgument) # processes that compute the metrics
+    # end
+
+    run.arguments_strModel = arguments_strModel
+    run.arguments_strPrecision = arguments_strPrecision
+
     fltPsnr = []
     fltSsim = []
 
-    for strTruth in sorted(glob.glob('./middlebury/*/frame10i11.png')):
+    def load(strTruth):
         tenOne = torch.FloatTensor(numpy.ascontiguousarray(numpy.array(PIL.Image.open(strTruth.replace('frame10i11', 'frame10')))[:, :, ::-1].transpose(2, 0, 1).astype(numpy.float32) * (1.0 / 255.0)))
         tenTwo = torch.FloatTensor(numpy.ascontiguousarray(numpy.array(PIL.Image.open(strTruth.replace('frame10i11', 'frame11')))[:, :, ::-1].transpose(2, 0, 1).astype(numpy.float32) * (1.0 / 255.0)))
-        
-        npyEstimate = (run.estimate(tenOne, tenTwo).clip(0.0, 1.0).numpy().transpose(1, 2, 0) * 255.0).round().astype(numpy.uint8)
 
-        fltPsnr.append(skimage.metrics.peak_signal_noise_ratio(image_true=numpy.array(PIL.Image.open(strTruth))[:, :, ::-1], image_test=npyEstimate, data_range=255))
-        fltSsim.append(skimage.metrics.structural_similarity(im1=numpy.array(PIL.Image.open(strTruth))[:, :, ::-1], im2=npyEstimate, data_range=255, multichannel=True))
+        return strTruth, tenOne, tenTwo
+    # end
+
+    def collect(objFuture):
+        fltMetrics = objFuture.result()
+
+        fltPsnr.append(fltMetrics[0])
+        fltSsim.append(fltMetrics[1])
+    # end
+
+    with concurrent.futures.ProcessPoolExecutor(arguments_intWorkers, mp_context=multiprocessing.get_context('spawn')) as objExecutor: # spawned rather than forked since the main process already runs threads of its own
+        objPending = collections.deque()
+
+        for strTruth, tenOne, tenTwo in run.prefetch(load, sorted(glob.glob('./middlebury/*/frame10i11.png'))): # the next samples are decoded in background threads while the current one is evaluated
+            npyEstimate = (run.estimate(tenOne, tenTwo).clip(0.0, 1.0).numpy().transpose(1, 2, 0) * 255.0).round().astype(numpy.uint8)
+
+            objPending.append(objExecutor.submit(metrics.evaluate, strTruth, npyEstimate))
+
+            while len(objPending) > 2 * arguments_intWorkers: # bounds the estimates that are waiting for their metrics
+                collect(objPending.popleft())
+            # end
+        # end
+
+        while len(objPending) > 0:
+            collect(objPending.popleft())
+        # end
     # end
 
     print('computed average psnr', numpy.mean(fltPsnr))
     print('computed average ssim', numpy.mean(fltSsim))
-# end
\ No newline at end of file
+# end
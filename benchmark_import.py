@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+
+import numpy
+import subprocess
+import sys
+
+##########################################################
+
+if __name__ == '__main__':
+    for strModule in ['torch', 'sepconv', 'run']:
+        fltTimes = []
+
+        for intRun in range(5):
+            fltTimes.append(float(subprocess.check_output([sys.executable, '-c', 'import time; fltStart = time.perf_counter(); import ' + strModule + '; print(time.perf_counter() - fltStart)']).decode().strip())) # a fresh process for every measurement such that nothing is cached within the interpreter
+        # end
+
+        print('import', strModule, 'median', numpy.median(fltTimes), 'min', numpy.min(fltTimes), 'seconds')
+    # end
+# end
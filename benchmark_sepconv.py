@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+import sys
+import time
+import torch
+
+import sepconv
+
+##########################################################
+
+if __name__ == '__main__':
+    # compares the two algorithms of the separable convolution on inputs as they occur in the network, a single image with the ones channel and kernels of size 51
+
+    torch.set_grad_enabled(False)
+
+    strDevice = sys.argv[1] if len(sys.argv) > 1 else 'cpu'
+
+    for intWidth, intHeight in [(160, 96), (568, 320), (1280, 720)]:
+        tenIn = torch.rand([1, 4, intHeight + 50, intWidth + 50], device=strDevice)
+        tenVer = torch.rand([1, 51, intHeight, intWidth], device=strDevice)
+        tenHor = torch.rand([1, 51, intHeight, intWidth], device=strDevice)
+
+        objOutputs = {}
+
+        for strAlgorithm in ['separable', 'direct']:
+            if strAlgorithm == 'direct' and strDevice == 'cpu' and intWidth * intHeight > 568 * 320:
+                continue # gathering the neighborhoods takes minutes at this size
+            # end
+
+            sepconv.sepconv_func.apply(tenIn, tenVer, tenHor, None, strAlgorithm)
+
+            if strDevice != 'cpu':
+                torch.cuda.synchronize()
+            # end
+
+            fltStart = time.perf_counter()
+
+            objOutputs[strAlgorithm] = sepconv.sepconv_func.apply(tenIn, tenVer, tenHor, None, strAlgorithm)
+
+            if strDevice != 'cpu':
+                torch.cuda.synchronize()
+            # end
+
+            print(str(intWidth) + 'x' + str(intHeight), strAlgorithm, '%.3f' % (time.perf_counter() - fltStart), 'seconds')
+        # end
+
+        if len(objOutputs) == 2:
+            print(str(intWidth) + 'x' + str(intHeight), 'largest relative difference', ((objOutputs['separable'] - objOutputs['direct']).abs() / objOutputs['direct'].abs()).max().item())
+        # end
+    # end
+# end
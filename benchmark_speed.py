@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+import collections
+import getopt
+import json
+import numpy
+import subprocess
+import sys
+import time
+import torch
+
+import run
+import sepconv
+
+##########################################################
+
+run.arguments_strModel = 'paper'
+
+arguments_strResolutions = '568x320,854x480,1280x720'
+arguments_strBatches = '1,2,4'
+arguments_intIterations = 10
+arguments_intWarmup = 2
+arguments_strOut = './benchmark_speed.json'
+
+##########################################################
+
+def synchronize():
+    if run.objDevice.type == 'cuda':
+        torch.cuda.synchronize()
+    # end
+# end
+
+def frames(intWidth, intHeight, intCount):
+    # random uint8 frames in rgb order and hwc layout, as they would be read from disk
+
+    objGenerator = numpy.random.default_rng(0)
+
+    return [objGenerator.integers(0, 256, [intHeight, intWidth, 3], numpy.uint8) for intFrame in range(intCount)]
+# end
+
+def coldstart():
+    # a fresh process for every measurement such that neither the imports nor the weights or the kernels are cached
+
+    strCode = '; '.join([
+        'import time',
+        'fltStart = time.perf_counter()',
+        'import numpy, run',
+        'fltImport = time.perf_counter()',
+        'run.arguments_strModel = ' + repr(run.arguments_strModel),
+        'run.arguments_strPrecision = ' + repr(run.arguments_strPrecision),
+        'run.arguments_strLayout = ' + repr(run.arguments_strLayout),
+        'run.arguments_strCompile = ' + repr(run.arguments_strCompile),
+        'run.netNetwork = run.network()',
+        'fltNetwork = time.perf_counter()',
+        'run.estimate(numpy.zeros([320, 568, 3], numpy.uint8), numpy.zeros([320, 568, 3], numpy.uint8))',
+        'fltEstimate = time.perf_counter()',
+        'print(fltImport - fltStart, fltNetwork - fltImport, fltEstimate - fltNetwork, fltEstimate - fltStart)'
+    ])
+
+    fltTimes = numpy.array([[float(strTime) for strTime in subprocess.check_output([sys.executable, '-c', strCode]).decode().split()] for intRun in range(3)])
+
+    return {strKey: float(numpy.median(fltTimes[:, intKey])) for intKey, strKey in enumerate(['import', 'network', 'first_estimate', 'total'])}
+# end
+
+def latency(intWidth, intHeight):
+    npyOne, npyTwo = frames(intWidth, intHeight, 2)
+
+    fltTimes = []
+
+    for intIteration in range(arguments_intWarmup + arguments_intIterations):
+        synchronize()
+        fltStart = time.perf_counter()
+        run.estimate(npyOne, npyTwo) # the uint8 result is downloaded, which synchronizes already
+        fltTimes.append(time.perf_counter() - fltStart)
+    # end
+
+    fltTimes = numpy.array(fltTimes[arguments_intWarmup:]) * 1000.0
+
+    return {'width': intWidth, 'height': intHeight, 'mean_ms': float(fltTimes.mean()), 'p50_ms': float(numpy.percentile(fltTimes, 50)), 'p90_ms': float(numpy.percentile(fltTimes, 90)), 'p99_ms': float(numpy.percentile(fltTimes, 99))}
+# end
+
+def throughput(intWidth, intHeight, intBatch):
+    npyFrames = frames(intWidth, intHeight, intBatch + 1)
+    objPairs = [(npyFrames[intPair], npyFrames[intPair + 1]) for intPair in range(intBatch)]
+
+    for intIteration in range(arguments_intWarmup):
+        run.estimate_batch(objPairs, intBatch, intPixels=intWidth * intHeight * intBatch) # the pixel budget would otherwise cap the larger batches at high resolutions
+    # end
+
+    synchronize()
+    fltStart = time.perf_counter()
+
+    for intIteration in range(arguments_intIterations):
+        run.estimate_batch(objPairs, intBatch, intPixels=intWidth * intHeight * intBatch) # the pixel budget would otherwise cap the larger batches at high resolutions
+    # end
+
+    synchronize()
+
+    return {'width': intWidth, 'height': intHeight, 'batch': intBatch, 'pairs_per_second': float(intBatch * arguments_intIterations / (time.perf_counter() - fltStart))}
+# end
+
+def breakdown(intWidth, intHeight):
+    # times the stages through wrappers and module hooks that synchronize the device, which is why this is separate from the latency and throughput measurements
+    # the unet includes the per-frame input layer, the remainder is the glue in between
+    # a compiled network runs the unet and the heads as one module that the hooks do not see into, they are hence timed together as unet+heads
+
+    npyOne, npyTwo = frames(intWidth, intHeight, 2)
+
+    run.estimate(npyOne, npyTwo) # makes sure that the network exists before the hooks are registered
+
+    boolCompiled = len(run.netNetwork.objCompiled) > 0
+
+    fltStages = collections.OrderedDict([(strStage, 0.0) for strStage in ['preprocess'] + (['unet+heads'] if boolCompiled == True else ['unet', 'heads']) + ['sepconv', 'postprocess', 'other']])
+    fltStarts = {}
+
+    def begin(strStage):
+        synchronize()
+        fltStarts[strStage] = time.perf_counter()
+    # end
+
+    def end(strStage):
+        synchronize()
+        fltStages[strStage] += time.perf_counter() - fltStarts[strStage]
+    # end
+
+    def wrap(strStage, objFunction):
+        def wrapped(*args, **kwargs):
+            begin(strStage)
+            objOutput = objFunction(*args, **kwargs)
+            end(strStage)
+            return objOutput
+        # end
+
+        return wrapped
+    # end
+
+    objPreprocess, objPostprocess, objFrame, objKernels, objApply = run.preprocess, run.postprocess, run.netNetwork.frame, run.netNetwork.kernels, sepconv.sepconv_pair_func.apply
+
+    run.preprocess = wrap('preprocess', objPreprocess)
+    run.postprocess = wrap('postprocess', objPostprocess)
+    run.netNetwork.frame = wrap('unet+heads' if boolCompiled == True else 'unet', objFrame)
+    sepconv.sepconv_pair_func.apply = wrap('sepconv', objApply)
+
+    objHooks = []
+
+    if boolCompiled == True:
+        run.netNetwork.kernels = wrap('unet+heads', objKernels)
+
+    elif True:
+        objHooks.append(run.netNetwork.netEncode.register_forward_pre_hook(lambda objModule, objInput: begin('unet')))
+        objHooks.append(run.netNetwork.netDecode.register_forward_hook(lambda objModule, objInput, objOutput: end('unet')))
+
+        objHooks.append(run.netNetwork.objFused['netHeads'].register_forward_pre_hook(lambda objModule, objInput: begin('heads')))
+        objHooks.append(run.netNetwork.objFused['netHeads'].register_forward_hook(lambda objModule, objInput, objOutput: end('heads')))
+
+    # end
+
+    try:
+        fltTotal = 0.0
+
+        for intIteration in range(arguments_intIterations):
+            synchronize()
+            fltStart = time.perf_counter()
+            run.estimate(npyOne, npyTwo)
+            fltTotal += time.perf_counter() - fltStart
+        # end
+
+    finally:
+        run.preprocess, run.postprocess = objPreprocess, objPostprocess
+        del run.netNetwork.frame
+
+        if boolCompiled == True:
+            del run.netNetwork.kernels
+        # end
+        del sepconv.sepconv_pair_func.apply
+
+        for objHook in objHooks:
+            objHook.remove()
+        # end
+
+    # end
+
+    fltStages['other'] = fltTotal - sum(fltStages.values())
+
+    return {'width': intWidth, 'height': intHeight, **{strStage + '_ms': 1000.0 * fltTime / arguments_intIterations for strStage, fltTime in fltStages.items()}}
+# end
+
+##########################################################
+
+if __name__ == '__main__':
+    torch.set_grad_enabled(False) # make sure to not compute gradients for computational performance
+
+    torch.backends.cudnn.enabled = True # make sure to use cudnn for computational performance
+
+    for strOption, strArgument in getopt.getopt(sys.argv[1:], '', [strParameter[2:] + '=' for strParameter in sys.argv[1::2]])[0]:
+        if strOption == '--model' and strArgument != '': run.arguments_strModel = strArgument # which model to use
+        if strOption == '--precision' and strArgument != '': run.arguments_strPrecision = strArgument # whether to run the u-net and the kernel heads in float32 or bfloat16
+        if strOption == '--layout' and strArgument != '': run.arguments_strLayout = strArgument # whether to run the network in the contiguous or the channels_last memory format
+        if strOption == '--compile' and strArgument != '': run.arguments_strCompile = strArgument # whether to run the network eagerly or through torchscript or torch.compile
+        if strOption == '--resolutions' and strArgument != '': arguments_strResolutions = strArgument # comma separated widthxheight resolutions to sweep
+        if strOption == '--batches' and strArgument != '': arguments_strBatches = strArgument # comma separated batch sizes to sweep
+        if strOption == '--iterations' and strArgument != '': arguments_intIterations = int(strArgument) # how many timed iterations per measurement
+        if strOption == '--warmup' and strArgument != '': arguments_intWarmup = int(strArgument) # how many untimed iterations precede the timed ones
+        if strOption == '--out' and strArgument != '': arguments_strOut = strArgument # path to where the json report should be stored
+    # end
+
+    objResolutions = [tuple(int(strSize) for strSize in strResolution.split('x')) for strResolution in arguments_strResolutions.split(',')]
+    intBatches = [int(strBatch) for strBatch in arguments_strBatches.split(',')]
+
+    objReport = {
+        'device': str(run.objDevice),
+        'torch': torch.__version__,
+        'threads': torch.get_num_threads(),
+        'model': run.arguments_strModel,
+        'precision': run.arguments_strPrecision,
+        'layout': run.arguments_strLayout,
+        'compile': run.arguments_strCompile,
+        'iterations': arguments_intIterations,
+        'warmup': arguments_intWarmup
+    }
+
+    objReport['coldstart'] = coldstart()
+    print('coldstart', ', '.join([strKey + ' ' + '%.3f' % fltTime + ' s' for strKey, fltTime in objReport['coldstart'].items()]))
+
+    objReport['latency'] = []
+    objReport['throughput'] = []
+    objReport['breakdown'] = []
+
+    for intWidth, intHeight in objResolutions:
+        objReport['latency'].append(latency(intWidth, intHeight))
+        print('latency', str(intWidth) + 'x' + str(intHeight), ', '.join([strKey + ' ' + '%.1f' % objReport['latency'][-1][strKey] for strKey in ['mean_ms', 'p50_ms', 'p90_ms', 'p99_ms']]))
+
+        for intBatch in intBatches:
+            objReport['throughput'].append(throughput(intWidth, intHeight, intBatch))
+            print('throughput', str(intWidth) + 'x' + str(intHeight), 'batch', intBatch, '%.2f' % objReport['throughput'][-1]['pairs_per_second'], 'pairs/s')
+        # end
+
+        objReport['breakdown'].append(breakdown(intWidth, intHeight))
+        print('breakdown', str(intWidth) + 'x' + str(intHeight), ', '.join([strKey + ' ' + '%.1f' % fltTime for strKey, fltTime in objReport['breakdown'][-1].items() if strKey.endswith('_ms')]))
+    # end
+
+    with open(arguments_strOut, 'w') as objFile:
+        json.dump(objReport, objFile, indent=4)
+    # end
+# end
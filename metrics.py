@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+
+import numpy
+import PIL
+import PIL.Image
+import skimage
+import skimage.metrics
+
+##########################################################
+
+def evaluate(strTruth, npyEstimate):
+    # runs in a worker process of benchmark.py, which is also where the ground truth is decoded such that the main process only ever decodes the inputs
+    # kept apart from benchmark.py and free of torch, such that the workers neither import torch nor the network
+
+    npyTruth = numpy.array(PIL.Image.open(strTruth))[:, :, ::-1]
+
+    return skimage.metrics.peak_signal_noise_ratio(image_true=npyTruth, image_test=npyEstimate, data_range=255), skimage.metrics.structural_similarity(im1=npyTruth, im2=npyEstimate, data_range=255, channel_axis=2)
+# end
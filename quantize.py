@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+import copy
+import getopt
+import glob
+import numpy
+import PIL
+import PIL.Image
+import sys
+import time
+import torch
+
+import run
+
+##########################################################
+
+run.arguments_strModel = 'paper'
+
+arguments_strOne = './middlebury/*/frame10.png'
+arguments_strTwo = './middlebury/*/frame11.png'
+arguments_strArtifact = './kernels-int8.pt'
+
+##########################################################
+
+if __name__ == '__main__':
+    # calibrates the int8 u-net on the given pairs, saves it as a torchscript artifact that run.py can load through --compile script --artifact, and reports its accuracy and speed against float32
+
+    torch.set_grad_enabled(False) # make sure to not compute gradients for computational performance
+
+    for strOption, strArgument in getopt.getopt(sys.argv[1:], '', [strParameter[2:] + '=' for strParameter in sys.argv[1::2]])[0]:
+        if strOption == '--model' and strArgument != '': run.arguments_strModel = strArgument # which model to use
+        if strOption == '--checkpoint' and strArgument != '': run.arguments_strCheckpoint = strArgument # path to a local checkpoint that is used instead of the model
+        if strOption == '--one' and strArgument != '': arguments_strOne = strArgument # glob of the first frames of the calibration pairs
+        if strOption == '--two' and strArgument != '': arguments_strTwo = strArgument # glob of the second frames of the calibration pairs
+        if strOption == '--artifact' and strArgument != '': arguments_strArtifact = strArgument # path to where the quantized torchscript module should be stored
+    # end
+
+    run.objDevice = torch.device('cpu') # the quantized convolutions only run on the cpu, also on a machine with a gpu
+
+    objPairs = []
+
+    for strOne, strTwo in zip(sorted(glob.glob(arguments_strOne)), sorted(glob.glob(arguments_strTwo))):
+        tenOne = run.preprocess(numpy.array(PIL.Image.open(strOne)))
+        tenTwo = run.preprocess(numpy.array(PIL.Image.open(strTwo)))
+
+        objPairs.append((tenOne[:, :, :2 * (tenOne.shape[2] // 2), :2 * (tenOne.shape[3] // 2)], tenTwo[:, :, :2 * (tenTwo.shape[2] // 2), :2 * (tenTwo.shape[3] // 2)])) # the network expects even dimensions
+    # end
+
+    assert(len(objPairs) > 0)
+
+    netFloat = run.Network().eval()
+    netQuantized = copy.deepcopy(netFloat)
+
+    netQuantized.quantize(objPairs)
+    netQuantized.compile('script', arguments_strArtifact, True) # always replaced, an existing artifact may stem from a different calibration set or model
+
+    print('saved', arguments_strArtifact, 'calibrated on', len(objPairs), 'pairs')
+
+    for strName, netNetwork in [('float32', netFloat), ('int8', netQuantized)]:
+        fltKernels = 0.0
+        fltTotal = 0.0
+
+        for tenOne, tenTwo in objPairs:
+            objOne = netNetwork.frame(tenOne)
+            objTwo = netNetwork.frame(tenTwo)
+
+            fltStart = time.perf_counter()
+            netNetwork.kernels(torch.cat([objOne['tenInput'], objTwo['tenInput']], 1)) # not normalized, which does not matter for the timing
+            fltKernels += time.perf_counter() - fltStart
+
+            fltStart = time.perf_counter()
+            netNetwork(tenOne, tenTwo)
+            fltTotal += time.perf_counter() - fltStart
+        # end
+
+        print(strName, 'u-net and heads', '%.3f' % (fltKernels / len(objPairs)), 'seconds per pair,', 'entire network', '%.3f' % (fltTotal / len(objPairs)), 'seconds per pair')
+    # end
+
+    fltPsnr = []
+
+    for tenOne, tenTwo in objPairs:
+        npyFloat = run.postprocess(netFloat(tenOne, tenTwo)[0]).astype(numpy.float64)
+        npyQuantized = run.postprocess(netQuantized(tenOne, tenTwo)[0]).astype(numpy.float64)
+
+        fltPsnr.append(10.0 * numpy.log10(255.0 * 255.0 / max(numpy.mean(numpy.square(npyFloat - npyQuantized)), 1e-10)))
+    # end
+
+    print('int8 against float32 psnr', '%.2f' % numpy.mean(fltPsnr), 'min', '%.2f' % numpy.min(fltPsnr))
+# end
@@ -1,11 +1,20 @@
 #!/usr/bin/env python
 
+import collections
+import concurrent.futures
 import getopt
+import hashlib
+import io
+import json
 import math
 import numpy
+import os
 import PIL
 import PIL.Image
+import queue
 import sys
+import threading
+import time
 import torch
 import typing
 
@@ -13,9 +22,7 @@ import sepconv # the custom separable convolution layer
 
 ##########################################################
 
-torch.set_grad_enabled(False) # make sure to not compute gradients for computational performance
-
-torch.backends.cudnn.enabled = True # make sure to use cudnn for computational performance
+objDevice = torch.device('cuda' if torch.cuda.is_available() == True else 'cpu') # the separable convolution falls back to a vectorized cpu implementation without a gpu
 
 ##########################################################
 
@@ -24,19 +31,78 @@ arguments_strOne = './images/one.png'
 arguments_strTwo = './images/two.png'
 arguments_strVideo = './videos/car-turn.mp4'
 arguments_strOut = './out.png'
+arguments_intQueue = 8
+arguments_boolProfile = False
+arguments_strCompile = 'eager'
+arguments_strPrecision = 'float32'
+arguments_strLayout = 'contiguous'
+arguments_strArtifact = ''
+arguments_boolOverwrite = False
+arguments_boolQuantized = False
+arguments_strCheckpoint = os.environ.get('RESEPCONV_CHECKPOINT', '') # a local checkpoint avoids the download, can also be set through the environment
+
+##########################################################
+
+class Evenize(torch.nn.Module):
+    def __init__(self, strPad:str):
+        super().__init__()
+
+        self.strPad = strPad
+    # end
 
-for strOption, strArgument in getopt.getopt(sys.argv[1:], '', [strParameter[2:] + '=' for strParameter in sys.argv[1::2]])[0]:
-    if strOption == '--model' and strArgument != '': arguments_strModel = strArgument # which model to use
-    if strOption == '--one' and strArgument != '': arguments_strOne = strArgument # path to the first frame
-    if strOption == '--two' and strArgument != '': arguments_strTwo = strArgument # path to the second frame
-    if strOption == '--video' and strArgument != '': arguments_strVideo = strArgument # path to a video
-    if strOption == '--out' and strArgument != '': arguments_strOut = strArgument # path to where the output should be stored
+    def forward(self, tenIn:torch.Tensor) -> torch.Tensor:
+        intPad = [0, 0, 0, 0]
+
+        if tenIn.shape[3] % 2 != 0: intPad[1] = 1
+        if tenIn.shape[2] % 2 != 0: intPad[3] = 1
+
+        if min(intPad) != 0 or max(intPad) != 0:
+            tenIn = torch.nn.functional.pad(input=tenIn, pad=intPad, mode=self.strPad if self.strPad != 'zeros' else 'constant', value=0.0)
+        # end
+
+        return tenIn
+    # end
 # end
 
-##########################################################
+class Up(torch.nn.Module):
+    def __init__(self, strType:str):
+        super().__init__()
+
+        assert(strType in ['nearest', 'bilinear', 'shuffle']) # the pyramid upsampling is not part of this implementation
+
+        self.strType = strType
+    # end
+
+    def forward(self, tenIn:torch.Tensor) -> torch.Tensor:
+        if self.strType == 'nearest':
+            return torch.nn.functional.interpolate(input=tenIn, scale_factor=2.0, mode='nearest-exact')
+
+        elif self.strType == 'bilinear':
+            return torch.nn.functional.interpolate(input=tenIn, scale_factor=2.0, mode='bilinear', align_corners=False)
+
+        elif self.strType == 'shuffle':
+            return torch.nn.functional.pixel_shuffle(tenIn, upscale_factor=2) # https://github.com/pytorch/pytorch/issues/62854
+
+        # end
+
+        assert(False) # to make torchscript happy
+    # end
+# end
+
+class Down(torch.nn.Module):
+    def __init__(self, fltScale:float):
+        super().__init__()
+
+        self.fltScale = fltScale
+    # end
+
+    def forward(self, tenIn:torch.Tensor) -> torch.Tensor:
+        return torch.nn.functional.interpolate(input=tenIn, scale_factor=self.fltScale, mode='bilinear', align_corners=False)
+    # end
+# end
 
 class Basic(torch.nn.Module):
-    def __init__(self, strType:str, intChans:typing.List[int], objScratch:typing.Optional[typing.Dict]=None):
+    def __init__(self, strType:str, intChans:typing.List[int]):
         super().__init__()
 
         self.strType = strType
@@ -52,27 +118,6 @@ class Basic(torch.nn.Module):
 
         for intPart, strPart in enumerate(self.strType.split('+')[0].split('-')):
             if strPart.startswith('evenize') == True and intPart == 0:
-                class Evenize(torch.nn.Module):
-                    def __init__(self, strPad):
-                        super().__init__()
-
-                        self.strPad = strPad
-                    # end
-
-                    def forward(self, tenIn:torch.Tensor) -> torch.Tensor:
-                        intPad = [0, 0, 0, 0]
-
-                        if tenIn.shape[3] % 2 != 0: intPad[1] = 1
-                        if tenIn.shape[2] % 2 != 0: intPad[3] = 1
-
-                        if min(intPad) != 0 or max(intPad) != 0:
-                            tenIn = torch.nn.functional.pad(input=tenIn, pad=intPad, mode=self.strPad if self.strPad != 'zeros' else 'constant', value=0.0)
-                        # end
-
-                        return tenIn
-                    # end
-                # end
-
                 strPad = 'zeros'
 
                 if '(' in strPart:
@@ -125,32 +170,6 @@ class Basic(torch.nn.Module):
                 fltStride *= 2.0
 
             elif strPart.startswith('up') == True:
-                class Up(torch.nn.Module):
-                    def __init__(self, strType):
-                        super().__init__()
-
-                        self.strType = strType
-                    # end
-
-                    def forward(self, tenIn:torch.Tensor) -> torch.Tensor:
-                        if self.strType == 'nearest':
-                            return torch.nn.functional.interpolate(input=tenIn, scale_factor=2.0, mode='nearest-exact', align_corners=False)
-
-                        elif self.strType == 'bilinear':
-                            return torch.nn.functional.interpolate(input=tenIn, scale_factor=2.0, mode='bilinear', align_corners=False)
-
-                        elif self.strType == 'pyramid':
-                            return pyramid(tenIn, None, 'up')
-
-                        elif self.strType == 'shuffle':
-                            return torch.nn.functional.pixel_shuffle(tenIn, upscale_factor=2) # https://github.com/pytorch/pytorch/issues/62854
-
-                        # end
-
-                        assert(False) # to make torchscript happy
-                    # end
-                # end
-
                 strType = 'bilinear'
 
                 if '(' in strPart:
@@ -183,33 +202,9 @@ class Basic(torch.nn.Module):
                     self.netShortcut = torch.nn.Conv2d(in_channels=intIn, out_channels=intOut, kernel_size=1, stride=1, padding=0, bias='nobias' not in self.strType.split('+'))
 
                 elif intIn == intOut and fltStride != 1.0:
-                    class Down(torch.nn.Module):
-                        def __init__(self, fltScale):
-                            super().__init__()
-
-                            self.fltScale = fltScale
-                        # end
-
-                        def forward(self, tenIn:torch.Tensor) -> torch.Tensor:
-                            return torch.nn.functional.interpolate(input=tenIn, scale_factor=self.fltScale, mode='bilinear', align_corners=False)
-                        # end
-                    # end
-
                     self.netShortcut = Down(1.0 / fltStride)
 
                 elif intIn != intOut and fltStride != 1.0:
-                    class Down(torch.nn.Module):
-                        def __init__(self, fltScale):
-                            super().__init__()
-
-                            self.fltScale = fltScale
-                        # end
-
-                        def forward(self, tenIn:torch.Tensor) -> torch.Tensor:
-                            return torch.nn.functional.interpolate(input=tenIn, scale_factor=self.fltScale, mode='bilinear', align_corners=False)
-                        # end
-                    # end
-
                     self.netShortcut = torch.nn.Sequential(Down(1.0 / fltStride), torch.nn.Conv2d(in_channels=intIn, out_channels=intOut, kernel_size=1, stride=1, padding=0, bias='nobias' not in self.strType.split('+')))
 
                 # end
@@ -239,9 +234,7 @@ class Basic(torch.nn.Module):
 # end
 
 class Encode(torch.nn.Module):
-    objScratch:typing.Dict[str, typing.List[int]] = None
-
-    def __init__(self, intIns:typing.List[int], intOuts:typing.List[int], strHor:str, strVer:str, objScratch:typing.Dict[str, typing.List[int]]):
+    def __init__(self, intIns:typing.List[int], intOuts:typing.List[int], strHor:str, strVer:str):
         super().__init__()
 
         assert(len(intIns) == len(intOuts))
@@ -252,7 +245,6 @@ class Encode(torch.nn.Module):
         self.intOuts = intOuts.copy()
         self.strHor = strHor
         self.strVer = strVer
-        self.objScratch = objScratch
 
         self.netHor = torch.nn.ModuleList()
         self.netVer = torch.nn.ModuleList()
@@ -263,11 +255,11 @@ class Encode(torch.nn.Module):
 
             if self.intOuts[intRow] != 0:
                 if self.intIns[intRow] != 0:
-                    netHor = Basic(self.strHor, [self.intIns[intRow], self.intOuts[intRow], self.intOuts[intRow]], objScratch)
+                    netHor = Basic(self.strHor, [self.intIns[intRow], self.intOuts[intRow], self.intOuts[intRow]])
                 # end
 
                 if intRow != 0:
-                    netVer = Basic(self.strVer, [self.intOuts[intRow - 1], self.intOuts[intRow], self.intOuts[intRow]], objScratch)
+                    netVer = Basic(self.strVer, [self.intOuts[intRow - 1], self.intOuts[intRow], self.intOuts[intRow]])
                 # end
             # end
 
@@ -291,24 +283,24 @@ class Encode(torch.nn.Module):
         for netVer in self.netVer:
             if self.intOuts[intRow] != 0:
                 if intRow != 0:
-                    tenIns[intRow] = tenIns[intRow] + netVer(tenIns[intRow - 1])
+                    if intRow < len(tenIns):
+                        tenIns[intRow] = tenIns[intRow] + netVer(tenIns[intRow - 1])
+
+                    elif True:
+                        tenIns.append(netVer(tenIns[intRow - 1])) # levels without an input are started from the level above, rather than from a zero placeholder that would not be a tensor
+
+                    # end
                 # end
             # end
             intRow += 1
         # end
 
-        for intRow, tenIn in enumerate(tenIns):
-            self.objScratch['levelshape' + str(intRow)] = tenIn.shape
-        # end
-
         return tenIns
     # end
 # end
 
 class Decode(torch.nn.Module):
-    objScratch:typing.Dict[str, typing.List[int]] = None
-
-    def __init__(self, intIns:typing.List[int], intOuts:typing.List[int], strHor:str, strVer:str, objScratch:typing.Dict[str, typing.List[int]]):
+    def __init__(self, intIns:typing.List[int], intOuts:typing.List[int], strHor:str, strVer:str):
         super().__init__()
 
         assert(len(intIns) == len(intOuts))
@@ -319,7 +311,6 @@ class Decode(torch.nn.Module):
         self.intOuts = intOuts.copy()
         self.strHor = strHor
         self.strVer = strVer
-        self.objScratch = objScratch
 
         self.netHor = torch.nn.ModuleList()
         self.netVer = torch.nn.ModuleList()
@@ -330,11 +321,11 @@ class Decode(torch.nn.Module):
 
             if self.intOuts[intRow] != 0:
                 if self.intIns[intRow] != 0:
-                    netHor = Basic(self.strHor, [self.intIns[intRow], self.intOuts[intRow], self.intOuts[intRow]], objScratch)
+                    netHor = Basic(self.strHor, [self.intIns[intRow], self.intOuts[intRow], self.intOuts[intRow]])
                 # end
 
                 if intRow != self.intRows - 1:
-                    netVer = Basic(self.strVer, [self.intOuts[intRow + 1], self.intOuts[intRow], self.intOuts[intRow]], objScratch)
+                    netVer = Basic(self.strVer, [self.intOuts[intRow + 1], self.intOuts[intRow], self.intOuts[intRow]])
                 # end
             # end
 
@@ -360,10 +351,8 @@ class Decode(torch.nn.Module):
                 if intRow != self.intRows - 1:
                     tenVer = netVer(tenIns[intRow + 1])
 
-                    if 'levelshape' + str(intRow) in self.objScratch:
-                        if tenVer.shape[2] == self.objScratch['levelshape' + str(intRow)][2] + 1: tenVer = torch.nn.functional.pad(input=tenVer, pad=[0, 0, 0, -1], mode='constant', value=0.0)
-                        if tenVer.shape[3] == self.objScratch['levelshape' + str(intRow)][3] + 1: tenVer = torch.nn.functional.pad(input=tenVer, pad=[0, -1, 0, 0], mode='constant', value=0.0)
-                    # end
+                    if tenVer.shape[2] == tenIns[intRow].shape[2] + 1: tenVer = torch.nn.functional.pad(input=tenVer, pad=[0, 0, 0, -1], mode='constant', value=0.0) # the shape of the level is that of its encoding, which is passed along instead of being recorded on the side
+                    if tenVer.shape[3] == tenIns[intRow].shape[3] + 1: tenVer = torch.nn.functional.pad(input=tenVer, pad=[0, -1, 0, 0], mode='constant', value=0.0)
 
                     tenIns[intRow] = tenIns[intRow] + tenVer
                 # end
@@ -375,24 +364,168 @@ class Decode(torch.nn.Module):
     # end
 # end
 
+class Sepconv(torch.nn.Module):
+    # the fused separable convolution of both frames as a module without parameters, such that it can be hooked into like the rest of the network
+
+    def __init__(self):
+        super().__init__()
+    # end
+
+    def forward(self, tenOne:torch.Tensor, tenTwo:torch.Tensor, tenVerone:torch.Tensor, tenHorone:torch.Tensor, tenVertwo:torch.Tensor, tenHortwo:torch.Tensor) -> torch.Tensor:
+        return sepconv.sepconv_pair_func.apply(tenOne, tenTwo, tenVerone, tenHorone, tenVertwo, tenHortwo)
+    # end
+# end
+
+class Heads(torch.nn.Module):
+    # evaluates the four kernel heads at once, upsampling only once and running their first convolutions as a single wide one and their second convolutions as a single grouped one
+    # the weights stay in the four heads and are concatenated on every call such that loading, conversions, in-place updates, training, and the checkpoint format are unaffected, freezing the scripted network folds the concatenation into constants
+
+    def __init__(self, netVerone:Basic, netVertwo:Basic, netHorone:Basic, netHortwo:Basic):
+        super().__init__()
+
+        for netHead in [netVerone, netVertwo, netHorone, netHortwo]:
+            assert(netHead.strType == 'up(bilinear)-conv(3)-prelu(0.25)-conv(3)')
+        # end
+
+        self.netUp = Up('bilinear')
+        self.netHeads = torch.nn.ModuleList([netVerone, netVertwo, netHorone, netHortwo])
+    # end
+
+    def grouped(self, tenIn:torch.Tensor) -> bool:
+        return tenIn.is_cuda == True or (tenIn.dtype == torch.bfloat16 and tenIn.is_contiguous(memory_format=torch.channels_last) == True) # the grouped convolutions of onednn only pay off in channels last bfloat16, the heads are otherwise faster on their own on the cpu
+    # end
+
+    def fuse(self) -> typing.List[torch.Tensor]:
+        tenWeightone:typing.List[torch.Tensor] = []
+        tenBiasone:typing.List[torch.Tensor] = []
+        tenSlope:typing.List[torch.Tensor] = []
+        tenWeighttwo:typing.List[torch.Tensor] = []
+        tenBiastwo:typing.List[torch.Tensor] = []
+
+        for netHead in self.netHeads:
+            tenOne = netHead.netMain[1].bias
+            tenTwo = netHead.netMain[3].bias
+
+            assert(tenOne is not None and tenTwo is not None) # to make torchscript happy
+
+            tenWeightone.append(netHead.netMain[1].weight)
+            tenBiasone.append(tenOne)
+            tenSlope.append(netHead.netMain[2].weight.repeat(netHead.netMain[1].out_channels)) # every head has a single slope of its own
+            tenWeighttwo.append(netHead.netMain[3].weight)
+            tenBiastwo.append(tenTwo)
+        # end
+
+        return [torch.cat(tenWeightone, 0), torch.cat(tenBiasone, 0), torch.cat(tenSlope, 0), torch.cat(tenWeighttwo, 0), torch.cat(tenBiastwo, 0)]
+    # end
+
+    def forward(self, tenIn:torch.Tensor) -> typing.Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        tenUp = self.netUp(tenIn) # shared by all heads
+
+        if self.grouped(tenIn) == False:
+            tenOuts:typing.List[torch.Tensor] = []
+
+            for netHead in self.netHeads:
+                tenOuts.append(netHead.netMain[3](netHead.netMain[2](netHead.netMain[1](tenUp))))
+            # end
+
+            return tenOuts[0], tenOuts[1], tenOuts[2], tenOuts[3]
+        # end
+
+        tenFused = self.fuse()
+
+        tenOut = torch.nn.functional.conv2d(input=tenUp, weight=tenFused[0], bias=tenFused[1], stride=1, padding=1)
+        tenOut = torch.nn.functional.prelu(tenOut, tenFused[2])
+        tenOut = torch.nn.functional.conv2d(input=tenOut, weight=tenFused[3], bias=tenFused[4], stride=1, padding=1, groups=len(self.netHeads))
+
+        tenOuts = tenOut.chunk(4, 1)
+
+        return tenOuts[0], tenOuts[1], tenOuts[2], tenOuts[3]
+    # end
+# end
+
+class Kernels(torch.nn.Module):
+    # the part of the network from the normalized input to the four kernels, which only consists of modules and tensors such that it can be scripted or compiled
+
+    def __init__(self, netEncode:'Encode', netDecode:'Decode', netHeads:Heads):
+        super().__init__()
+
+        self.netEncode = netEncode
+        self.netDecode = netDecode
+        self.netHeads = netHeads
+    # end
+
+    def forward(self, tenIn:torch.Tensor) -> typing.Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        return self.netHeads(self.netDecode(self.netEncode([tenIn]))[1])
+    # end
+# end
+
+class Quantconv(torch.nn.Module):
+    # a convolution that quantizes its input and dequantizes its output, such that it can be quantized on its own while everything around it stays in float32
+
+    def __init__(self, netConv:torch.nn.Conv2d):
+        super().__init__()
+
+        self.netQuant = torch.ao.quantization.QuantStub()
+        self.netConv = netConv
+        self.netDequant = torch.ao.quantization.DeQuantStub()
+    # end
+
+    def forward(self, tenIn:torch.Tensor) -> torch.Tensor:
+        return self.netDequant(self.netConv(self.netQuant(tenIn)))
+    # end
+# end
+
+def checkpoint() -> str:
+    # identifies the weights that a network is created from, a local checkpoint through its path, size, and modification time
+
+    if arguments_strCheckpoint != '':
+        objStat = os.stat(arguments_strCheckpoint)
+
+        return os.path.abspath(arguments_strCheckpoint) + ':' + str(objStat.st_size) + ':' + str(objStat.st_mtime_ns)
+    # end
+
+    return 'network-' + arguments_strModel
+# end
+
+def artifact(strArtifact:str, objDevice:torch.device):
+    # loads a torchscript artifact that was saved by Network.compile together with what it was saved from and with the weights of the input layer
+
+    objFiles = {'meta.json': '', 'input.pt': ''}
+
+    netKernels = torch.jit.load(strArtifact, map_location=objDevice, _extra_files=objFiles)
+
+    objMeta = json.loads(objFiles['meta.json']) if len(objFiles['meta.json']) > 0 else {} # artifacts from before the description was stored match nothing
+    objInput = torch.load(io.BytesIO(objFiles['input.pt']), map_location=objDevice, weights_only=True) if len(objFiles['input.pt']) > 0 else None
+
+    return netKernels, objMeta, objInput
+# end
+
+def mismatch(strArtifact:str, objMeta:dict, objExpected:dict):
+    # refuses an artifact that was saved from a different model, checkpoint, precision, layout, or quantization than the one that is asked for
+
+    strKeys = [strKey for strKey, objValue in objExpected.items() if objMeta.get(strKey) != objValue]
+
+    if len(strKeys) > 0:
+        raise RuntimeError('the artifact ' + strArtifact + ' does not match in its ' + ', '.join([strKey + ' (' + str(objMeta.get(strKey)) + ' instead of ' + str(objExpected[strKey]) + ')' for strKey in strKeys]) + ', overwrite it to replace it')
+    # end
+# end
+
 ##########################################################
 
 class Network(torch.nn.Module):
     def __init__(self):
         super().__init__()
 
-        self.objScratch = {}
-
         self.intChannels = [32, 64, 128, 256, 512]
 
         self.netInput = torch.nn.Conv2d(in_channels=3, out_channels=int(round(0.5 * self.intChannels[0])), kernel_size=3, stride=1, padding=1, padding_mode='zeros')
 
         self.netEncode = torch.nn.Sequential(
-            Encode([0] * len(self.intChannels), self.intChannels, 'prelu(0.25)-conv(3)-prelu(0.25)-conv(3)+skip', 'prelu(0.25)-sconv(3)-prelu(0.25)-conv(3)', self.objScratch)
+            Encode([0] * len(self.intChannels), self.intChannels, 'prelu(0.25)-conv(3)-prelu(0.25)-conv(3)+skip', 'prelu(0.25)-sconv(3)-prelu(0.25)-conv(3)')
         )
 
         self.netDecode = torch.nn.Sequential(
-            Decode([0] + self.intChannels[1:], [0] + self.intChannels[1:], 'prelu(0.25)-conv(3)-prelu(0.25)-conv(3)+skip', 'prelu(0.25)-up(bilinear)-conv(3)-prelu(0.25)-conv(3)', self.objScratch)
+            Decode([0] + self.intChannels[1:], [0] + self.intChannels[1:], 'prelu(0.25)-conv(3)-prelu(0.25)-conv(3)+skip', 'prelu(0.25)-up(bilinear)-conv(3)-prelu(0.25)-conv(3)')
         )
 
         self.netVerone = Basic('up(bilinear)-conv(3)-prelu(0.25)-conv(3)', [self.intChannels[1], self.intChannels[1], 51])
@@ -400,83 +533,733 @@ class Network(torch.nn.Module):
         self.netHorone = Basic('up(bilinear)-conv(3)-prelu(0.25)-conv(3)', [self.intChannels[1], self.intChannels[1], 51])
         self.netHortwo = Basic('up(bilinear)-conv(3)-prelu(0.25)-conv(3)', [self.intChannels[1], self.intChannels[1], 51])
 
-        self.load_state_dict(torch.hub.load_state_dict_from_url(url='http://content.sniklaus.com/resepconv/network-' + arguments_strModel + '.pytorch', file_name='resepconv-' + arguments_strModel))
+        self.netSepconv = Sepconv()
+
+        self.objFused = {'netHeads': Heads(self.netVerone, self.netVertwo, self.netHorone, self.netHortwo)} # kept in a dictionary such that the heads are not registered a second time, which would duplicate their parameters in the checkpoint
+
+        self.objPrecision = torch.float32
+
+        self.objFormat = torch.contiguous_format
+
+        self.objCompiled = {} # kept in a dictionary such that the compiled counterparts are not registered as submodules with parameters of their own
+
+        self.objProfile = None
+
+        self.boolArtifact = False
+
+        self.strModel = arguments_strModel
+        self.strCheckpoint = checkpoint()
+
+        if arguments_strCheckpoint != '':
+            try:
+                objState = torch.load(arguments_strCheckpoint, map_location='cpu', mmap=True, weights_only=True) # memory-mapped such that processes on the same host share the weights through the page cache
+
+            except RuntimeError:
+                objState = torch.load(arguments_strCheckpoint, map_location='cpu', weights_only=True) # checkpoints in the legacy format can not be memory-mapped
+
+            # end
+
+            self.load_state_dict(objState, assign=True) # the parameters keep pointing into the memory-mapped file instead of being copied
+
+        elif arguments_strCheckpoint == '':
+            self.load_state_dict(torch.hub.load_state_dict_from_url(url='http://content.sniklaus.com/resepconv/network-' + arguments_strModel + '.pytorch', file_name='resepconv-' + arguments_strModel))
+
+        # end
+    # end
+
+    @staticmethod
+    def load(strArtifact:str) -> 'Network':
+        # a network that runs entirely from a torchscript artifact, neither the modules are created nor the checkpoint is loaded, which is what makes starting a worker cheap
+        # there are no weights to compare the artifact with, it is hence checked against the arguments instead
+
+        if arguments_boolQuantized == True and objDevice.type != 'cpu':
+            raise RuntimeError('the int8 artifact ' + strArtifact + ' only runs on the cpu, its quantized convolutions cannot be loaded onto ' + str(objDevice))
+        # end
+
+        netKernels, objMeta, objInput = artifact(strArtifact, objDevice)
+
+        mismatch(strArtifact, objMeta, {'model': arguments_strModel, 'checkpoint': checkpoint(), 'precision': arguments_strPrecision, 'layout': arguments_strLayout, 'quantized': arguments_boolQuantized})
+
+        netNetwork = Network.__new__(Network)
+
+        torch.nn.Module.__init__(netNetwork)
+
+        netNetwork.netInput = torch.nn.Conv2d(in_channels=objInput['weight'].shape[1], out_channels=objInput['weight'].shape[0], kernel_size=3, stride=1, padding=1, padding_mode='zeros', device=objDevice)
+        netNetwork.netInput.load_state_dict(objInput)
+
+        netNetwork.netSepconv = Sepconv()
+
+        netNetwork.objPrecision = {'float32': torch.float32, 'bfloat16': torch.bfloat16}[objMeta['precision']]
+        netNetwork.objFormat = {'contiguous': torch.contiguous_format, 'channels_last': torch.channels_last}[objMeta['layout']]
+        netNetwork.objCompiled = {'netKernels': netKernels}
+        netNetwork.objFused = {}
+        netNetwork.objProfile = None
+        netNetwork.boolArtifact = True
+        netNetwork.strModel = objMeta['model']
+        netNetwork.strCheckpoint = objMeta['checkpoint']
+
+        return netNetwork.eval()
+    # end
+
+    def meta(self) -> dict:
+        # what a torchscript artifact of this network depends on, the weights are hashed as they are after any conversion or quantization
+
+        objHash = hashlib.sha1()
+
+        for strKey, objValue in self.state_dict().items():
+            if type(objValue) == torch.Tensor:
+                objValue = objValue.detach().cpu()
+
+                if objValue.is_quantized == True:
+                    objHash.update(str([objValue.q_scale(), objValue.q_zero_point()] if objValue.qscheme() == torch.per_tensor_affine else [objValue.q_per_channel_scales().tolist(), objValue.q_per_channel_zero_points().tolist()]).encode())
+
+                    objValue = objValue.int_repr()
+                # end
+
+                objHash.update(strKey.encode())
+                objHash.update(objValue.contiguous().view(-1).view(torch.uint8).numpy().tobytes())
+            # end
+        # end
+
+        return {
+            'model': self.strModel,
+            'checkpoint': self.strCheckpoint,
+            'weights': objHash.hexdigest(),
+            'precision': {torch.float32: 'float32', torch.bfloat16: 'bfloat16'}[self.objPrecision],
+            'layout': {torch.contiguous_format: 'contiguous', torch.channels_last: 'channels_last'}[self.objFormat],
+            'quantized': any([type(netModule) == Quantconv for netModule in self.modules()])
+        }
     # end
 
-    def forward(self, tenOne, tenTwo):
-        tenSone = torch.nn.functional.pad(input=torch.cat([tenOne, tenOne.new_ones([tenOne.shape[0], 1, tenOne.shape[2], tenOne.shape[3]])], 1), pad=[int(math.floor(0.5 * 51)), int(math.floor(0.5 * 51)), int(math.floor(0.5 * 51)), int(math.floor(0.5 * 51))], mode='replicate')
-        tenStwo = torch.nn.functional.pad(input=torch.cat([tenTwo, tenTwo.new_ones([tenTwo.shape[0], 1, tenTwo.shape[2], tenTwo.shape[3]])], 1), pad=[int(math.floor(0.5 * 51)), int(math.floor(0.5 * 51)), int(math.floor(0.5 * 51)), int(math.floor(0.5 * 51))], mode='replicate')
+    def stats(self, tenOne, tenTwo):
+        tenStats = [tenOne, tenTwo]
+        tenMean = sum([tenIn.mean([1, 2, 3], True) for tenIn in tenStats]) / len(tenStats)
+        tenStd = (sum([tenIn.std([1, 2, 3], False, True).square() + (tenMean - tenIn.mean([1, 2, 3], True)).square() for tenIn in tenStats]) / len(tenStats)).sqrt()
+
+        return tenMean, tenStd
+    # end
+
+    def frame(self, tenFrame):
+        # the work that only depends on a single frame, such that it can be reused for all pairs that the frame is part of
 
         with torch.set_grad_enabled(False):
-            tenStats = [tenOne, tenTwo]
-            tenMean = sum([tenIn.mean([1, 2, 3], True) for tenIn in tenStats]) / len(tenStats)
-            tenStd = (sum([tenIn.std([1, 2, 3], False, True).square() + (tenMean - tenIn.mean([1, 2, 3], True)).square() for tenIn in tenStats]) / len(tenStats)).sqrt()
-            tenOne = ((tenOne - tenMean) / (tenStd + 0.0000001)).detach()
-            tenTwo = ((tenTwo - tenMean) / (tenStd + 0.0000001)).detach()
+            tenFrame = tenFrame.contiguous(memory_format=self.objFormat)
+
+            tenMean = tenFrame.mean([1, 2, 3], True)
+            tenVar = tenFrame.std([1, 2, 3], False, True).square()
         # end
 
-        tenOut = self.netDecode(self.netEncode([torch.cat([self.netInput(tenOne), self.netInput(tenTwo)], 1)] + ([0.0] * (len(self.intChannels) - 1))))[1]
+        tenInput = torch.nn.functional.conv2d(input=tenFrame, weight=self.netInput.weight, bias=None, stride=1, padding=1) # the input layer is linear, it is hence applied before the normalization which depends on both frames
+
+        return {
+            'tenMean': tenMean,
+            'tenVar': tenVar,
+            'tenInput': tenInput,
+            'tenFrame': tenFrame.detach() # the separable convolution pads it on the fly
+        }
+    # end
 
-        tenVerone = self.netVerone(tenOut)
-        tenVertwo = self.netVertwo(tenOut)
-        tenHorone = self.netHorone(tenOut)
-        tenHortwo = self.netHortwo(tenOut)
+    def pair(self, objOne, objTwo, tenMean=None, tenStd=None): # the statistics can be provided for when the frames are only tiles of larger ones
+        with torch.set_grad_enabled(False):
+            if tenMean is None or tenStd is None:
+                tenMean = (objOne['tenMean'] + objTwo['tenMean']) / 2.0
+                tenStd = (((objOne['tenVar'] + (tenMean - objOne['tenMean']).square()) + (objTwo['tenVar'] + (tenMean - objTwo['tenMean']).square())) / 2.0).sqrt()
+            # end
+        # end
 
-        tenOut = sum([
-            sepconv.sepconv_func.apply(tenSone.detach(), tenVerone, tenHorone),
-            sepconv.sepconv_func.apply(tenStwo.detach(), tenVertwo, tenHortwo)
-        ])
+        tenOnes = torch.nn.functional.conv2d(input=objOne['tenInput'].new_ones([1, 1, objOne['tenInput'].shape[2], objOne['tenInput'].shape[3]]), weight=self.netInput.weight.sum(1, True), bias=None, stride=1, padding=1) # the response to a constant input, which differs from the sum of the weights along the zero-padded border
 
-        tenNormalize = tenOut[:, -1:, :, :]
-        tenNormalize[tenNormalize.abs() < 0.01] = 1.0
-        tenOut = tenOut[:, :-1, :, :] / tenNormalize
+        tenOne = ((objOne['tenInput'] - (tenMean * tenOnes)) / (tenStd + 0.0000001)) + self.netInput.bias.view(1, -1, 1, 1)
+        tenTwo = ((objTwo['tenInput'] - (tenMean * tenOnes)) / (tenStd + 0.0000001)) + self.netInput.bias.view(1, -1, 1, 1)
 
-        return tenOut
+        tenVerone, tenVertwo, tenHorone, tenHortwo = self.kernels(torch.cat([tenOne, tenTwo], 1))
+
+        return self.netSepconv(objOne['tenFrame'], objTwo['tenFrame'], tenVerone, tenHorone, tenVertwo, tenHortwo) # already normalized
+    # end
+
+    def kernels(self, tenIn):
+        tenIn = tenIn.to(self.objPrecision)
+
+        if 'netKernels' in self.objCompiled:
+            tenKernels = self.objCompiled['netKernels'](tenIn)
+
+        elif True:
+            tenKernels = self.objFused['netHeads'](self.netDecode(self.netEncode([tenIn]))[1])
+
+        # end
+
+        return tuple([tenKernel.float().contiguous(memory_format=self.objFormat) for tenKernel in tenKernels]) # the separable convolution and the normalization always happen in float32, and the quantized convolutions leave their outputs in channels last order regardless of the layout
+    # end
+
+    def forward(self, tenOne, tenTwo, tenMean=None, tenStd=None):
+        return self.pair(self.frame(tenOne), self.frame(tenTwo), tenMean, tenStd)
+    # end
+
+    def frozen(self):
+        return self.boolArtifact # a network that was loaded from an artifact is frozen in its precision, layout, and quantization, it cannot be converted any further
+    # end
+
+    def precision(self, strPrecision:str='float32'):
+        # converts the u-net and the kernel heads, the input layer stays in float32 such that the normalization happens before the conversion
+
+        assert(self.frozen() == False)
+
+        self.objPrecision = {'float32': torch.float32, 'bfloat16': torch.bfloat16}[strPrecision]
+
+        for netModule in [self.netEncode, self.netDecode, self.netVerone, self.netVertwo, self.netHorone, self.netHortwo]:
+            netModule.to(self.objPrecision)
+        # end
+
+        self.objCompiled.clear() # a compiled network needs to be compiled again    # end
+
+    def quantize(self, objPairs):
+        # post-training static quantization of the convolutions in the u-net to int8 on the cpu, calibrated on the given pairs of frames with even dimensions
+        # the kernel heads stay in float32 since the separable convolution amplifies any error in the kernels, the result can be saved and loaded through compile
+
+        assert(self.frozen() == False)
+
+        assert(self.objPrecision == torch.float32)
+        assert(next(self.parameters()).is_cuda == False)
+
+        torch.backends.quantized.engine = 'x86' if 'x86' in torch.backends.quantized.supported_engines else 'fbgemm'
+
+        for netModule in list(self.netEncode.modules()) + list(self.netDecode.modules()):
+            for strName, netChild in list(netModule.named_children()):
+                if type(netChild) == torch.nn.Conv2d:
+                    netChild = Quantconv(netChild)
+                    netChild.qconfig = torch.ao.quantization.get_default_qconfig(torch.backends.quantized.engine)
+
+                    setattr(netModule, strName, netChild)
+                # end
+            # end
+        # end
+
+        torch.ao.quantization.prepare(self.netEncode, inplace=True)
+        torch.ao.quantization.prepare(self.netDecode, inplace=True)
+
+        self.objCompiled.clear()
+        with torch.no_grad():
+            for tenOne, tenTwo in objPairs:
+                self.forward(tenOne, tenTwo)
+            # end
+        # end
+
+        torch.ao.quantization.convert(self.netEncode, inplace=True)
+        torch.ao.quantization.convert(self.netDecode, inplace=True)
+    # end
+
+    def layout(self, strLayout:str='contiguous'):
+        # keeps the weights, the activations, the kernels, and the frames in the given memory format throughout, such that the convolutions do not reorder them internally
+
+        assert(self.frozen() == False)
+
+        self.objFormat = {'contiguous': torch.contiguous_format, 'channels_last': torch.channels_last}[strLayout]
+
+        self.to(memory_format=self.objFormat)
+
+        self.objCompiled.clear() # a compiled network needs to be compiled again    # end
+
+    def compile(self, strMode:str='script', strArtifact:str='', boolOverwrite:bool=False):
+        # runs the u-net and the kernel heads through torchscript or torch.compile, the frozen torchscript module can be saved to strArtifact and is loaded from there if it exists such that it only has to be scripted once
+        # an existing artifact is only loaded if it was saved from this very network, it is only replaced if boolOverwrite is set
+
+        assert(self.frozen() == False) # a network that was loaded from an artifact has nothing left to compile
+
+        self.objCompiled.clear()
+
+        if strMode == 'script':
+            if strArtifact != '' and os.path.isfile(strArtifact) == True and boolOverwrite == False:
+                netKernels, objMeta, objInput = artifact(strArtifact, next(self.parameters()).device)
+
+                mismatch(strArtifact, objMeta, self.meta())
+
+            elif True:
+                netKernels = torch.jit.freeze(torch.jit.script(Kernels(self.netEncode[0], self.netDecode[0], self.objFused['netHeads']).eval())) # the parameters become constants, which lets the optimizer fold and fuse the operations around them
+
+                if strArtifact != '':
+                    objInput = io.BytesIO()
+
+                    torch.save({strKey: tenValue.cpu() for strKey, tenValue in self.netInput.state_dict().items()}, objInput)
+
+                    torch.jit.save(netKernels, strArtifact + '.tmp', _extra_files={'meta.json': json.dumps(self.meta()), 'input.pt': objInput.getvalue()}) # the input layer is stored alongside, such that the artifact suffices to run the network
+                    os.replace(strArtifact + '.tmp', strArtifact) # processes that load the artifact concurrently never see a partial file
+                # end
+
+            # end
+
+            self.objCompiled['netKernels'] = netKernels
+
+        elif strMode == 'compile':
+            self.objCompiled['netKernels'] = torch.compile(Kernels(self.netEncode[0], self.netDecode[0], self.objFused['netHeads']), dynamic=True) # the resolution varies between calls
+
+        elif strMode == 'eager':
+            pass
+
+        elif True:
+            assert(False)
+
+        # end
+    # end
+
+    def profile(self, boolEnable:bool=True):
+        # attaches timing hooks to the blocks, the levels, the heads, and the separable convolution, the hooks are removed again when disabled such that the forward pass is unaffected
+
+        if self.objProfile is not None:
+            for objHook in self.objProfile['objHooks']:
+                objHook.remove()
+            # end
+
+            self.objProfile = None
+        # end
+
+        if boolEnable == False:
+            return
+        # end
+
+        self.objProfile = {'objHooks': [], 'objStack': [], 'objStats': {}}
+
+        objNames = {netModule: strName for strName, netModule in self.named_modules()}
+        objNames.update({netHeads: 'netHeads' for netHeads in self.objFused.values()})
+
+        for strName, netModule in self.named_modules():
+            if type(netModule) in [Encode, Decode]:
+                for intRow in range(netModule.intRows):
+                    intIndex = intRow if type(netModule) == Encode else netModule.intRows - 1 - intRow
+
+                    objNames[netModule.netHor[intIndex]] = strName + '.level' + str(intRow) + '.hor'
+                    objNames[netModule.netVer[intIndex]] = strName + '.level' + str(intRow) + '.ver'
+                # end
+            # end
+        # end
+
+        def synchronize():
+            if next(self.parameters()).is_cuda == True:
+                torch.cuda.synchronize()
+            # end
+        # end
+
+        def stats(strName):
+            return self.objProfile['objStats'].setdefault(strName, {'intCalls': 0, 'fltTotal': 0.0, 'fltSelf': 0.0, 'fltFlops': 0.0, 'fltBytes': 0.0})
+        # end
+
+        def size(tenIns):
+            return sum([tenIn.nelement() * tenIn.element_size() for tenIn in tenIns if type(tenIn) == torch.Tensor])
+        # end
+
+        def pre(netModule, objInput):
+            synchronize()
+
+            self.objProfile['objStack'].append([objNames[netModule], time.perf_counter(), 0.0])
+        # end
+
+        def post(netModule, objInput, objOutput):
+            synchronize()
+
+            strName, fltStart, fltChildren = self.objProfile['objStack'].pop()
+            fltTotal = time.perf_counter() - fltStart
+
+            objStats = stats(strName)
+            objStats['intCalls'] += 1
+            objStats['fltTotal'] += fltTotal
+            objStats['fltSelf'] += fltTotal - fltChildren
+
+            if type(netModule) == Sepconv:
+                objStats['fltFlops'] += 2.0 * objOutput.nelement() * 2.0 * (objInput[2].shape[1] * objInput[3].shape[1] + objInput[3].shape[1]) # the multiply-adds of the direct form, every output is a weighted sum over the two-dimensional kernels of both frames
+                objStats['fltBytes'] += size(objInput) + size([objOutput])
+            # end
+
+            if type(netModule) == Heads and netModule.grouped(objInput[0]) == True: # the convolutions of the heads are otherwise modules with hooks of their own
+                for netConv in [netHead.netMain[intConv] for netHead in netModule.netHeads for intConv in [1, 3]]:
+                    objStats['fltFlops'] += 2.0 * objOutput[0].shape[0] * objOutput[0].shape[2] * objOutput[0].shape[3] * netConv.out_channels * netConv.in_channels * netConv.kernel_size[0] * netConv.kernel_size[1] # the convolutions are functional within the fused heads, such that their hooks do not see them
+                    objStats['fltBytes'] += size([netConv.weight, netConv.bias])
+                # end
+
+                objStats['fltBytes'] += size(objInput) + size(list(objOutput))
+            # end
+
+            if len(self.objProfile['objStack']) > 0:
+                self.objProfile['objStack'][-1][2] += fltTotal
+            # end
+        # end
+
+        def conv(netModule, objInput, objOutput):
+            if len(self.objProfile['objStack']) > 0:
+                objStats = stats(self.objProfile['objStack'][-1][0]) # the estimates of a convolution are attributed to the innermost profiled module
+                objStats['fltFlops'] += 2.0 * objOutput.nelement() * (netModule.in_channels // netModule.groups) * netModule.kernel_size[0] * netModule.kernel_size[1]
+                objStats['fltBytes'] += size(objInput) + size([objOutput, netModule.weight, netModule.bias])
+            # end
+        # end
+
+        for netModule in list(self.modules()) + list(self.objFused.values()):
+            if type(netModule) in [Basic, Encode, Decode, Heads, Sepconv]:
+                self.objProfile['objHooks'].append(netModule.register_forward_pre_hook(pre))
+                self.objProfile['objHooks'].append(netModule.register_forward_hook(post))
+
+            elif type(netModule) == torch.nn.Conv2d:
+                self.objProfile['objHooks'].append(netModule.register_forward_hook(conv))
+
+            # end
+        # end
+    # end
+
+    def profile_report(self) -> str:
+        # the statistics aggregated over all calls since profiling was enabled, sorted by the time spent in a module itself rather than in the profiled modules within it
+
+        assert(self.objProfile is not None)
+
+        strReport = ['%-28s %8s %12s %12s %10s %10s' % ('module', 'calls', 'total ms', 'self ms', 'gflop', 'mbyte')]
+
+        for strName, objStats in sorted(self.objProfile['objStats'].items(), key=lambda objItem: -objItem[1]['fltSelf']):
+            strReport.append('%-28s %8d %12.2f %12.2f %10.3f %10.1f' % (strName, objStats['intCalls'], 1000.0 * objStats['fltTotal'], 1000.0 * objStats['fltSelf'], objStats['fltFlops'] / 1000000000.0, objStats['fltBytes'] / 1000000.0))
+        # end
+
+        return '\n'.join(strReport)
     # end
 # end
 
 netNetwork = None
 
+objFramecache = collections.OrderedDict() # the per-frame results of the network for frames that were given a key, evicting the least recently used ones
+intFramecache = 3 # every entry holds a padded frame and its input-layer response in float32 on the device, which is around 70 mb at 720p, and the video loop only ever reuses three of them
+
 ##########################################################
 
-def estimate(tenOne, tenTwo):
+def preprocess(objFrame):
+    # frames are either float tensors in bgr order and chw layout or uint8 arrays in rgb order and hwc layout as read from disk, the latter are uploaded as they are and converted on the device
+
+    if type(objFrame) == numpy.ndarray:
+        assert(objFrame.dtype == numpy.uint8)
+
+        return (torch.from_numpy(numpy.ascontiguousarray(objFrame)).to(objDevice).permute(2, 0, 1)[[2, 1, 0]] * (1.0 / 255.0)).view(1, 3, objFrame.shape[0], objFrame.shape[1])
+    # end
+
+    return objFrame.to(objDevice).view(1, 3, objFrame.shape[1], objFrame.shape[2])
+# end
+
+def postprocess(tenFrame):
+    # quantizes an estimate into a uint8 array in rgb order and hwc layout on the device such that only that array is downloaded
+
+    return tenFrame.permute(1, 2, 0)[:, :, [2, 1, 0]].mul_(255.0).clamp_(0.0, 255.0).to(torch.uint8).cpu().numpy()
+# end
+
+def network():
+    # the network as configured through the arguments, shared by all estimate functions such that none of them ignores any of the arguments
+
+    if arguments_strCompile == 'script' and arguments_strArtifact != '' and os.path.isfile(arguments_strArtifact) == True and arguments_boolOverwrite == False:
+        return Network.load(arguments_strArtifact) # neither creates the modules nor loads the checkpoint
+    # end
+
+    netNetwork = Network().to(objDevice).eval()
+    netNetwork.precision(arguments_strPrecision)
+    netNetwork.layout(arguments_strLayout)
+    netNetwork.compile(arguments_strCompile, arguments_strArtifact, arguments_boolOverwrite)
+
+    return netNetwork
+# end
+
+def estimate(objOne, objTwo, objKeys=None):
+    return estimate_batch([(objOne, objTwo)], objKeys=[objKeys] if objKeys is not None else None)[0]
+# end
+
+def estimate_frames(objFrames, objKeys, intPadr, intPadb):
+    # the per-frame results of the network for each of the given frames, frames with a key are looked up in and stored into the cache
+
+    objOutputs = [objFramecache.get(objKey) if objKey is not None else None for objKey in objKeys]
+
+    intMissing = [intFrame for intFrame, objOutput in enumerate(objOutputs) if objOutput is None]
+
+    if len(intMissing) > 0:
+        tenFrames = torch.nn.functional.pad(input=torch.cat([preprocess(objFrames[intFrame]) for intFrame in intMissing], 0), pad=[0, intPadr, 0, intPadb], mode='replicate')
+
+        objBatch = netNetwork.frame(tenFrames)
+
+        for intSample, intFrame in enumerate(intMissing):
+            objOutputs[intFrame] = {strKey: tenValue[intSample:intSample + 1] for strKey, tenValue in objBatch.items()}
+
+            if objKeys[intFrame] is not None:
+                objFramecache[objKeys[intFrame]] = objOutputs[intFrame]
+            # end
+        # end
+    # end
+
+    for objKey in objKeys:
+        if objKey is not None:
+            objFramecache.move_to_end(objKey)
+        # end
+    # end
+
+    while len(objFramecache) > intFramecache:
+        objFramecache.popitem(last=False)
+    # end
+
+    return {strKey: torch.cat([objOutput[strKey] for objOutput in objOutputs], 0) for strKey in objOutputs[0]}
+# end
+
+@torch.no_grad()
+def estimate_batch(objPairs, intBatch=8, objKeys=None, intPixels=1280 * 720): # the optional keys identify the two frames of each pair, the results for frames that are part of multiple pairs are then cached
     global netNetwork
 
     if netNetwork is None:
-        netNetwork = Network().cuda().eval()
+        netNetwork = network()
+    # end
+
+    objOutputs = [None] * len(objPairs)
+    objGroups = {}
+
+    for intPair, (objOne, objTwo) in enumerate(objPairs):
+        assert(objOne.shape == objTwo.shape)
+        assert(type(objOne) == type(objTwo))
+
+        objGroups.setdefault(tuple(objOne.shape[0:2]) if type(objOne) == numpy.ndarray else tuple(objOne.shape[1:3]), []).append(intPair) # only pairs of the same resolution can share a batch
+    # end
+
+    for (intHeight, intWidth), intPairs in objGroups.items():
+        if intWidth > 1280 or intHeight > 720:
+            for intPair in intPairs:
+                objOutputs[intPair] = estimate_tiled(objPairs[intPair][0], objPairs[intPair][1]) # while our approach works with larger images, we do not recommend it unless you are aware of the implications
+            # end
+
+        elif True:
+            intPadr = (2 - (intWidth % 2)) % 2
+            intPadb = (2 - (intHeight % 2)) % 2
+
+            intChunksize = max(1, min(intBatch, intPixels // ((intWidth + intPadr) * (intHeight + intPadb)))) # the kernels and the activations of the heads grow with the pixels of a pass, which is hence bounded like the batches of estimate_tiled, separately for every resolution
+
+            for intChunk in range(0, len(intPairs), intChunksize):
+                objOne = estimate_frames([objPairs[intPair][0] for intPair in intPairs[intChunk:intChunk + intChunksize]], [objKeys[intPair][0] if objKeys is not None else None for intPair in intPairs[intChunk:intChunk + intChunksize]], intPadr, intPadb)
+                objTwo = estimate_frames([objPairs[intPair][1] for intPair in intPairs[intChunk:intChunk + intChunksize]], [objKeys[intPair][1] if objKeys is not None else None for intPair in intPairs[intChunk:intChunk + intChunksize]], intPadr, intPadb)
+
+                tenEstimate = netNetwork.pair(objOne, objTwo)[:, :, :intHeight, :intWidth]
+
+                for intSample, intPair in enumerate(intPairs[intChunk:intChunk + intChunksize]):
+                    objOutputs[intPair] = postprocess(tenEstimate[intSample]) if type(objPairs[intPair][0]) == numpy.ndarray else tenEstimate[intSample].to(objPairs[intPair][0].device) # the estimate is returned in the format and on the device of the input
+                # end
+            # end
+
+        # end
     # end
 
-    assert(tenOne.shape[1] == tenTwo.shape[1])
-    assert(tenOne.shape[2] == tenTwo.shape[2])
+    return objOutputs
+# end
+
+@torch.no_grad()
+def estimate_tiled(objOne, objTwo, intTilewidth=1280, intTileheight=720, intHalo=128):
+    global netNetwork
+
+    if netNetwork is None:
+        netNetwork = network()
+    # end
 
-    intWidth = tenOne.shape[2]
-    intHeight = tenOne.shape[1]
+    assert(objOne.shape == objTwo.shape)
+    assert(type(objOne) == type(objTwo))
 
-    assert(intWidth <= 1280) # while our approach works with larger images, we do not recommend it unless you are aware of the implications
-    assert(intHeight <= 720) # while our approach works with larger images, we do not recommend it unless you are aware of the implications
+    assert(intHalo % 16 == 0) # tiles need to start at multiples of 16 to share the pyramid of the entire frame
+    assert(intHalo >= int(math.floor(0.5 * 51))) # the halo needs to at least cover the kernels
 
-    tenPreprocessedOne = tenOne.cuda().view(1, 3, intHeight, intWidth)
-    tenPreprocessedTwo = tenTwo.cuda().view(1, 3, intHeight, intWidth)
+    tenPreprocessedOne = preprocess(objOne)
+    tenPreprocessedTwo = preprocess(objTwo)
 
-    intPadr = (2 - (intWidth % 2)) % 2
-    intPadb = (2 - (intHeight % 2)) % 2
+    intWidth = tenPreprocessedOne.shape[3]
+    intHeight = tenPreprocessedOne.shape[2]
+
+    tenMean, tenStd = netNetwork.stats(tenPreprocessedOne, tenPreprocessedTwo) # statistics of the entire frames such that all tiles are normalized alike
+
+    intPadr = (16 - (intWidth % 16)) % 16
+    intPadb = (16 - (intHeight % 16)) % 16
 
     tenPreprocessedOne = torch.nn.functional.pad(input=tenPreprocessedOne, pad=[0, intPadr, 0, intPadb], mode='replicate')
     tenPreprocessedTwo = torch.nn.functional.pad(input=tenPreprocessedTwo, pad=[0, intPadr, 0, intPadb], mode='replicate')
 
-    return netNetwork(tenPreprocessedOne, tenPreprocessedTwo)[0, :, :intHeight, :intWidth].cpu()
+    intTiles = []
+
+    for intSize, intTile in [(intHeight + intPadb, intTileheight), (intWidth + intPadr, intTilewidth)]:
+        intCores = 1 if intSize <= intTile else int(math.ceil(intSize / max(16, intTile - (2 * intHalo))))
+        intCore = int(math.ceil(intSize / intCores / 16.0)) * 16
+        intWindow = min(intSize, intCore + (2 * intHalo))
+
+        intTiles.append([(min(max(intStart - intHalo, 0), intSize - intWindow), intWindow, intStart, min(intStart + intCore, intSize)) for intStart in range(0, intSize, intCore)])
+    # end
+
+    intTiles = [(objVer, objHor) for objVer in intTiles[0] for objHor in intTiles[1]] # every tile is (window start, window size, core start, core stop) along each axis
+    intBatch = max(1, (intTilewidth * intTileheight) // (intTiles[0][0][1] * intTiles[0][1][1])) # all windows have the same size and can be batched as long as a batch does not exceed a single tile
+
+    tenOutput = tenPreprocessedOne.new_empty([3, intHeight + intPadb, intWidth + intPadr])
+
+    for intChunk in range(0, len(intTiles), intBatch):
+        objChunk = intTiles[intChunk:intChunk + intBatch]
+
+        tenEstimate = netNetwork(
+            torch.cat([tenPreprocessedOne[:, :, objVer[0]:objVer[0] + objVer[1], objHor[0]:objHor[0] + objHor[1]] for objVer, objHor in objChunk], 0),
+            torch.cat([tenPreprocessedTwo[:, :, objVer[0]:objVer[0] + objVer[1], objHor[0]:objHor[0] + objHor[1]] for objVer, objHor in objChunk], 0),
+            tenMean,
+            tenStd
+        )
+
+        for intTile, (objVer, objHor) in enumerate(objChunk):
+            tenOutput[:, objVer[2]:objVer[3], objHor[2]:objHor[3]] = tenEstimate[intTile, :, objVer[2] - objVer[0]:objVer[3] - objVer[0], objHor[2] - objHor[0]:objHor[3] - objHor[0]] # the halo is cropped such that the cores of the tiles stitch together seamlessly
+        # end
+    # end
+
+    return postprocess(tenOutput[:, :intHeight, :intWidth]) if type(objOne) == numpy.ndarray else tenOutput[:, :intHeight, :intWidth].to(objOne.device)
+# end
+
+def estimate_video(objFrames):
+    tenFrames = [None, None, None, None, None]
+
+    objVideo = object() # distinguishes the keys of the frames of this video from those of others within the cache
+
+    try:
+        for intFrame, npyFrame in enumerate(objFrames):
+            tenFrames[4] = preprocess(npyFrame)[0] # converted only once and kept on the device for both pairs that it is part of
+
+            if tenFrames[0] is not None:
+                tenFrames[2] = estimate(tenFrames[0], tenFrames[4], [(objVideo, intFrame - 1, 0), (objVideo, intFrame, 0)])
+                tenFrames[1], tenFrames[3] = estimate_batch([(tenFrames[0], tenFrames[2]), (tenFrames[2], tenFrames[4])], objKeys=[[(objVideo, intFrame - 1, 0), (objVideo, intFrame - 1, 2)], [(objVideo, intFrame - 1, 2), (objVideo, intFrame, 0)]])
+
+                for tenFrame in tenFrames[0:4]:
+                    yield postprocess(tenFrame)
+                # end
+            # end
+
+            tenFrames[0] = tenFrames[4]
+        # end
+
+    finally:
+        for objKey in [objKey for objKey in objFramecache if type(objKey) == tuple and objKey[0] is objVideo]: # the frames of a finished or abandoned video are never looked up again
+            del objFramecache[objKey]
+        # end
+
+    # end
+# end
+
+def background(objIterable, intQueue=8):
+    # iterates over objIterable in a separate thread, the bounded queue applies backpressure once the consumer falls behind and exceptions are raised again in the consumer
+
+    objQueue = queue.Queue(maxsize=intQueue)
+
+    def produce():
+        try:
+            for objItem in objIterable:
+                objQueue.put(('item', objItem))
+            # end
+
+            objQueue.put(('done', None))
+
+        except Exception as objError:
+            objQueue.put(('error', objError))
+
+        # end
+    # end
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    while True:
+        strKind, objItem = objQueue.get()
+
+        if strKind == 'item':
+            yield objItem
+
+        elif strKind == 'done':
+            break
+
+        elif strKind == 'error':
+            raise objItem
+
+        # end
+    # end
+# end
+
+def prefetch(objLoad, objItems, intLookahead=8, intMemory=1024 ** 3, intThreads=4):
+    # calls objLoad on each of the items in worker threads ahead of the consumer and yields the results in order, at most intLookahead results are in flight and together they stay below intMemory bytes once the size of a result is known
+
+    def size(objResult):
+        if type(objResult) in [list, tuple]:
+            return sum([size(objElement) for objElement in objResult])
+
+        elif type(objResult) == torch.Tensor:
+            return objResult.nelement() * objResult.element_size()
+
+        elif type(objResult) == numpy.ndarray:
+            return objResult.nbytes
+
+        # end
+
+        return 0
+    # end
+
+    objItems = iter(objItems)
+    objPending = collections.deque()
+    intSize = 0 # the largest result so far, only one result is in flight until it is known
+
+    objExecutor = concurrent.futures.ThreadPoolExecutor(intThreads)
+
+    try:
+        while True:
+            intFlight = max(1, min(intLookahead, intMemory // intSize)) if intSize > 0 else 1
+
+            while len(objPending) < intFlight:
+                objItem = next(objItems, objPending)
+
+                if objItem is objPending:
+                    break
+                # end
+
+                objPending.append(objExecutor.submit(objLoad, objItem))
+            # end
+
+            if len(objPending) == 0:
+                break
+            # end
+
+            objResult = objPending.popleft().result()
+
+            intSize = max(intSize, size(objResult))
+
+            yield objResult
+        # end
+
+    finally:
+        objExecutor.shutdown(wait=False, cancel_futures=True)
+
+    # end
 # end
 
 ##########################################################
 
 if __name__ == '__main__':
+    torch.set_grad_enabled(False) # make sure to not compute gradients for computational performance
+
+    torch.backends.cudnn.enabled = True # make sure to use cudnn for computational performance
+
+    for strOption, strArgument in getopt.getopt(sys.argv[1:], '', [strParameter[2:] + '=' for strParameter in sys.argv[1::2]])[0]:
+        if strOption == '--model' and strArgument != '': arguments_strModel = strArgument # which model to use
+        if strOption == '--one' and strArgument != '': arguments_strOne = strArgument # path to the first frame
+        if strOption == '--two' and strArgument != '': arguments_strTwo = strArgument # path to the second frame
+        if strOption == '--video' and strArgument != '': arguments_strVideo = strArgument # path to a video
+        if strOption == '--out' and strArgument != '': arguments_strOut = strArgument # path to where the output should be stored
+        if strOption == '--queue' and strArgument != '': arguments_intQueue = int(strArgument) # how many frames may be buffered between the stages of the video pipeline
+        if strOption == '--checkpoint' and strArgument != '': arguments_strCheckpoint = strArgument # path to a local checkpoint that is used instead of the model
+        if strOption == '--precision' and strArgument != '': arguments_strPrecision = strArgument # whether to run the u-net and the kernel heads in float32 or bfloat16
+        if strOption == '--layout' and strArgument != '': arguments_strLayout = strArgument # whether to run the network in the contiguous or the channels_last memory format
+        if strOption == '--compile' and strArgument != '': arguments_strCompile = strArgument # whether to run the network eagerly or through torchscript or torch.compile
+        if strOption == '--artifact' and strArgument != '': arguments_strArtifact = strArgument # path to where the torchscript module is stored and loaded from
+        if strOption == '--overwrite' and strArgument != '': arguments_boolOverwrite = strArgument.lower() in ['1', 'true', 'yes'] # whether to replace the artifact instead of loading it
+        if strOption == '--quantized' and strArgument != '': arguments_boolQuantized = strArgument.lower() in ['1', 'true', 'yes'] # whether the artifact is expected to hold the int8 u-net from quantize.py
+        if strOption == '--profile' and strArgument != '': arguments_boolProfile = strArgument.lower() in ['1', 'true', 'yes'] # whether to print the time spent in each part of the network
+    # end
+
+    if arguments_boolProfile == True:
+        netNetwork = network()
+        netNetwork.profile(True)
+    # end
+
     if arguments_strOut.split('.')[-1] in ['bmp', 'jpg', 'jpeg', 'png']:
-        tenOne = torch.FloatTensor(numpy.ascontiguousarray(numpy.array(PIL.Image.open(arguments_strOne))[:, :, ::-1].transpose(2, 0, 1).astype(numpy.float32) * (1.0 / 255.0)))
-        tenTwo = torch.FloatTensor(numpy.ascontiguousarray(numpy.array(PIL.Image.open(arguments_strTwo))[:, :, ::-1].transpose(2, 0, 1).astype(numpy.float32) * (1.0 / 255.0)))
+        npyOne = numpy.array(PIL.Image.open(arguments_strOne))
+        npyTwo = numpy.array(PIL.Image.open(arguments_strTwo))
 
-        tenOutput = estimate(tenOne, tenTwo)
+        npyOutput = estimate(npyOne, npyTwo)
 
-        PIL.Image.fromarray((tenOutput.clip(0.0, 1.0).numpy().transpose(1, 2, 0)[:, :, ::-1] * 255.0).astype(numpy.uint8)).save(arguments_strOut)
+        PIL.Image.fromarray(npyOutput).save(arguments_strOut)
 
     elif arguments_strOut.split('.')[-1] in ['avi', 'mp4', 'webm', 'wmv']:
         import moviepy
@@ -488,26 +1271,15 @@ if __name__ == '__main__':
         intWidth = objVideoreader.w
         intHeight = objVideoreader.h
 
-        tenFrames = [None, None, None, None, None]
-
         with moviepy.video.io.ffmpeg_writer.FFMPEG_VideoWriter(filename=arguments_strOut, size=(intWidth, intHeight), fps=objVideoreader.fps) as objVideowriter:
-            for npyFrame in objVideoreader.iter_frames():
-                tenFrames[4] = torch.FloatTensor(numpy.ascontiguousarray(npyFrame[:, :, ::-1].transpose(2, 0, 1).astype(numpy.float32) * (1.0 / 255.0)))
-
-                if tenFrames[0] is not None:
-                    tenFrames[2] = estimate(tenFrames[0], tenFrames[4])
-                    tenFrames[1] = estimate(tenFrames[0], tenFrames[2])
-                    tenFrames[3] = estimate(tenFrames[2], tenFrames[4])
-
-                    objVideowriter.write_frame((tenFrames[0].clip(0.0, 1.0).numpy().transpose(1, 2, 0)[:, :, ::-1] * 255.0).astype(numpy.uint8))
-                    objVideowriter.write_frame((tenFrames[1].clip(0.0, 1.0).numpy().transpose(1, 2, 0)[:, :, ::-1] * 255.0).astype(numpy.uint8))
-                    objVideowriter.write_frame((tenFrames[2].clip(0.0, 1.0).numpy().transpose(1, 2, 0)[:, :, ::-1] * 255.0).astype(numpy.uint8))
-                    objVideowriter.write_frame((tenFrames[3].clip(0.0, 1.0).numpy().transpose(1, 2, 0)[:, :, ::-1] * 255.0).astype(numpy.uint8))
-                # end
-
-                tenFrames[0] = torch.FloatTensor(numpy.ascontiguousarray(npyFrame[:, :, ::-1].transpose(2, 0, 1).astype(numpy.float32) * (1.0 / 255.0)))
+            for npyFrame in background(estimate_video(background(objVideoreader.iter_frames(), arguments_intQueue)), arguments_intQueue): # decoding, inference, and encoding each run in their own thread
+                objVideowriter.write_frame(npyFrame)
             # end
         # end
 
     # end
+
+    if arguments_boolProfile == True:
+        print(netNetwork.profile_report())
+    # end
 # end
\ No newline at end of file
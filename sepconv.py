@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 
 import collections
-import cupy
 import os
 import re
 import torch
@@ -13,13 +12,45 @@ import typing
 
 objCudacache = {}
 
+objCudatemplate = {}
+
+objCudamacro = re.compile(r'\{\{([a-zA-Z0-9_]+)\}\}|(SIZE|OFFSET|VALUE)_([0-4])\(') # the variables as well as the start of the macros, whose arguments are then parsed by counting parentheses
+
+objCudatype = {
+    torch.uint8: 'unsigned char',
+    torch.float16: 'half',
+    torch.float32: 'float',
+    torch.float64: 'double',
+    torch.int32: 'int',
+    torch.int64: 'long'
+}
+
+cupy = None # only imported once a cuda tensor reaches the layer, such that the cpu implementation does not depend on it
+
+intCpubudget = 1024 * 1024 * 1024 # bytes that the cpu implementation may spend on gathered neighborhoods, larger outputs are processed in tiles
+
+intCpucache = 256 * 1024 # bytes of partial sums that the separable algorithm keeps per tile on the cpu, such that they stay in the cache while the kernel taps are accumulated
+
+
+def cuda_import():
+    global cupy
+
+    if cupy is None:
+        import cupy
+    # end
+# end
+
 
 def cuda_int32(intIn:int):
+    cuda_import()
+
     return cupy.int32(intIn)
 # end
 
 
 def cuda_float32(fltIn:float):
+    cuda_import()
+
     return cupy.float32(fltIn)
 # end
 
@@ -66,158 +97,320 @@ def cuda_kernel(strFunction:str, strKernel:str, objVariables:typing.Dict):
     strKey += objCudacache['device']
 
     if strKey not in objCudacache:
-        for strVariable in objVariables:
-            objValue = objVariables[strVariable]
+        strKernel = cuda_expand(strFunction, strKernel, objVariables)
+
+        objCudacache[strKey] = {
+            'strFunction': strFunction,
+            'strKernel': strKernel
+        }
+    # end
+
+    return strKey
+# end
 
-            if objValue is None:
-                continue
 
-            elif type(objValue) == int:
-                strKernel = strKernel.replace('{{' + strVariable + '}}', str(objValue))
+def cuda_parse(strKernel:str):
+    # splits the kernel into literals and macros in a single pass, the arguments of the macros are parsed recursively
 
-            elif type(objValue) == float:
-                strKernel = strKernel.replace('{{' + strVariable + '}}', str(objValue))
+    objTokens = []
+    intStart = 0
 
-            elif type(objValue) == bool:
-                strKernel = strKernel.replace('{{' + strVariable + '}}', str(objValue))
+    while True:
+        objMatch = objCudamacro.search(strKernel, intStart)
 
-            elif type(objValue) == str:
-                strKernel = strKernel.replace('{{' + strVariable + '}}', objValue)
+        if objMatch is None:
+            objTokens.append(strKernel[intStart:])
 
-            elif type(objValue) == torch.Tensor and objValue.dtype == torch.uint8:
-                strKernel = strKernel.replace('{{type}}', 'unsigned char')
+            break
+        # end
+
+        objTokens.append(strKernel[intStart:objMatch.start()])
 
-            elif type(objValue) == torch.Tensor and objValue.dtype == torch.float16:
-                strKernel = strKernel.replace('{{type}}', 'half')
+        if objMatch.group(1) is not None:
+            objTokens.append(('VARIABLE', objMatch.group(1)))
 
-            elif type(objValue) == torch.Tensor and objValue.dtype == torch.float32:
-                strKernel = strKernel.replace('{{type}}', 'float')
+            intStart = objMatch.end()
 
-            elif type(objValue) == torch.Tensor and objValue.dtype == torch.float64:
-                strKernel = strKernel.replace('{{type}}', 'double')
+        elif objMatch.group(1) is None:
+            intStop = objMatch.end()
+            intArg = objMatch.end()
+            intParentheses = 1
+            strArgs = []
 
-            elif type(objValue) == torch.Tensor and objValue.dtype == torch.int32:
-                strKernel = strKernel.replace('{{type}}', 'int')
+            while True:
+                intParentheses += 1 if strKernel[intStop] == '(' else 0
+                intParentheses -= 1 if strKernel[intStop] == ')' else 0
 
-            elif type(objValue) == torch.Tensor and objValue.dtype == torch.int64:
-                strKernel = strKernel.replace('{{type}}', 'long')
+                if intParentheses == 0 or (intParentheses == 1 and strKernel[intStop] == ','):
+                    strArgs.append(strKernel[intArg:intStop])
 
-            elif type(objValue) == torch.Tensor:
-                print(strVariable, objValue.dtype)
-                assert(False)
+                    intArg = intStop + 1
+                # end
 
-            elif True:
-                print(strVariable, type(objValue))
-                assert(False)
+                if intParentheses == 0:
+                    break
+                # end
 
+                intStop += 1
             # end
+
+            objTokens.append((objMatch.group(2), int(objMatch.group(3)), strArgs[0], [cuda_parse(strArg) for strArg in strArgs[1:]]))
+
+            intStart = intStop + 1
+
         # end
+    # end
 
-        while True:
-            objMatch = re.search('(SIZE_)([0-4])(\()([^\)]*)(\))', strKernel)
+    return objTokens
+# end
 
-            if objMatch is None:
-                break
+
+def cuda_substitute(objTokens:typing.List, objVariables:typing.Dict, objReplace:typing.Dict[str, str]):
+    strKernel = []
+
+    for objToken in objTokens:
+        if type(objToken) == str:
+            strKernel.append(objToken)
+
+        elif objToken[0] == 'VARIABLE':
+            strKernel.append(objReplace[objToken[1]] if objToken[1] in objReplace else '{{' + objToken[1] + '}}')
+
+        elif objToken[0] == 'SIZE':
+            strKernel.append(str(objVariables[objToken[2]].size()[objToken[1]]))
+
+        elif objToken[0] == 'OFFSET' or objToken[0] == 'VALUE':
+            assert(objToken[1] == len(objToken[3]))
+
+            intStrides = objVariables[objToken[2]].stride()
+
+            strIndex = []
+
+            for intArg in range(objToken[1]):
+                strIndex.append('((' + cuda_substitute(objToken[3][intArg], objVariables, objReplace).replace('{', '(').replace('}', ')').strip() + ')*' + str(intStrides[intArg]) + ')')
             # end
 
-            intArg = int(objMatch.group(2))
+            if objToken[0] == 'OFFSET':
+                strKernel.append('(' + str.join('+', strIndex) + ')')
+
+            elif objToken[0] == 'VALUE':
+                strKernel.append(objToken[2] + '[' + str.join('+', strIndex) + ']')
 
-            strTensor = objMatch.group(4)
-            intSizes = objVariables[strTensor].size()
+            # end
 
-            strKernel = strKernel.replace(objMatch.group(), str(intSizes[intArg] if torch.is_tensor(intSizes[intArg]) == False else intSizes[intArg].item()))
         # end
+    # end
 
-        while True:
-            objMatch = re.search('(OFFSET_)([0-4])(\()', strKernel)
+    return str.join('', strKernel)
+# end
 
-            if objMatch is None:
-                break
-            # end
 
-            intStart = objMatch.span()[1]
-            intStop = objMatch.span()[1]
-            intParentheses = 1
+def cuda_expand(strFunction:str, strKernel:str, objVariables:typing.Dict):
+    # the parsed template is memoized per function, such that only the constants that depend on the shapes need to be substituted for every new key
 
-            while True:
-                intParentheses += 1 if strKernel[intStop] == '(' else 0
-                intParentheses -= 1 if strKernel[intStop] == ')' else 0
+    if strFunction not in objCudatemplate or objCudatemplate[strFunction]['strKernel'] != strKernel:
+        objCudatemplate[strFunction] = {
+            'strKernel': strKernel,
+            'objTokens': cuda_parse(strKernel)
+        }
+    # end
 
-                if intParentheses == 0:
-                    break
-                # end
+    objReplace = {}
 
-                intStop += 1
-            # end
+    for strVariable in objVariables:
+        objValue = objVariables[strVariable]
 
-            intArgs = int(objMatch.group(2))
-            strArgs = strKernel[intStart:intStop].split(',')
+        if objValue is None:
+            continue
 
-            assert(intArgs == len(strArgs) - 1)
+        elif type(objValue) == int:
+            objReplace[strVariable] = str(objValue)
 
-            strTensor = strArgs[0]
-            intStrides = objVariables[strTensor].stride()
+        elif type(objValue) == float:
+            objReplace[strVariable] = str(objValue)
 
-            strIndex = []
+        elif type(objValue) == bool:
+            objReplace[strVariable] = str(objValue)
 
-            for intArg in range(intArgs):
-                strIndex.append('((' + strArgs[intArg + 1].replace('{', '(').replace('}', ')').strip() + ')*' + str(intStrides[intArg] if torch.is_tensor(intStrides[intArg]) == False else intStrides[intArg].item()) + ')')
-            # end
+        elif type(objValue) == str:
+            objReplace[strVariable] = objValue
+
+        elif type(objValue) == torch.Tensor and objValue.dtype in objCudatype:
+            objReplace.setdefault('type', objCudatype[objValue.dtype]) # the first tensor determines the type
+
+        elif type(objValue) == torch.Tensor:
+            print(strVariable, objValue.dtype)
+            assert(False)
+
+        elif True:
+            print(strVariable, type(objValue))
+            assert(False)
+
+        # end
+    # end
+
+    return cuda_substitute(objCudatemplate[strFunction]['objTokens'], objVariables, objReplace)
+# end
+
+
+def cuda_expand_regex(strKernel:str, objVariables:typing.Dict):
+    # the previous expander that searches and replaces every macro on the entire kernel, only kept as a reference that cuda_expand is verified against
+
+    for strVariable in objVariables:
+        objValue = objVariables[strVariable]
+
+        if objValue is None:
+            continue
+
+        elif type(objValue) == int:
+            strKernel = strKernel.replace('{{' + strVariable + '}}', str(objValue))
 
-            strKernel = strKernel.replace('OFFSET_' + str(intArgs) + '(' + strKernel[intStart:intStop] + ')', '(' + str.join('+', strIndex) + ')')
+        elif type(objValue) == float:
+            strKernel = strKernel.replace('{{' + strVariable + '}}', str(objValue))
+
+        elif type(objValue) == bool:
+            strKernel = strKernel.replace('{{' + strVariable + '}}', str(objValue))
+
+        elif type(objValue) == str:
+            strKernel = strKernel.replace('{{' + strVariable + '}}', objValue)
+
+        elif type(objValue) == torch.Tensor and objValue.dtype == torch.uint8:
+            strKernel = strKernel.replace('{{type}}', 'unsigned char')
+
+        elif type(objValue) == torch.Tensor and objValue.dtype == torch.float16:
+            strKernel = strKernel.replace('{{type}}', 'half')
+
+        elif type(objValue) == torch.Tensor and objValue.dtype == torch.float32:
+            strKernel = strKernel.replace('{{type}}', 'float')
+
+        elif type(objValue) == torch.Tensor and objValue.dtype == torch.float64:
+            strKernel = strKernel.replace('{{type}}', 'double')
+
+        elif type(objValue) == torch.Tensor and objValue.dtype == torch.int32:
+            strKernel = strKernel.replace('{{type}}', 'int')
+
+        elif type(objValue) == torch.Tensor and objValue.dtype == torch.int64:
+            strKernel = strKernel.replace('{{type}}', 'long')
+
+        elif type(objValue) == torch.Tensor:
+            print(strVariable, objValue.dtype)
+            assert(False)
+
+        elif True:
+            print(strVariable, type(objValue))
+            assert(False)
+
+        # end
+    # end
+
+    while True:
+        objMatch = re.search('(SIZE_)([0-4])(\()([^\)]*)(\))', strKernel)
+
+        if objMatch is None:
+            break
+        # end
+
+        intArg = int(objMatch.group(2))
+
+        strTensor = objMatch.group(4)
+        intSizes = objVariables[strTensor].size()
+
+        strKernel = strKernel.replace(objMatch.group(), str(intSizes[intArg] if torch.is_tensor(intSizes[intArg]) == False else intSizes[intArg].item()))
+    # end
+
+    while True:
+        objMatch = re.search('(OFFSET_)([0-4])(\()', strKernel)
+
+        if objMatch is None:
+            break
         # end
 
+        intStart = objMatch.span()[1]
+        intStop = objMatch.span()[1]
+        intParentheses = 1
+
         while True:
-            objMatch = re.search('(VALUE_)([0-4])(\()', strKernel)
+            intParentheses += 1 if strKernel[intStop] == '(' else 0
+            intParentheses -= 1 if strKernel[intStop] == ')' else 0
 
-            if objMatch is None:
+            if intParentheses == 0:
                 break
             # end
 
-            intStart = objMatch.span()[1]
-            intStop = objMatch.span()[1]
-            intParentheses = 1
+            intStop += 1
+        # end
 
-            while True:
-                intParentheses += 1 if strKernel[intStop] == '(' else 0
-                intParentheses -= 1 if strKernel[intStop] == ')' else 0
+        intArgs = int(objMatch.group(2))
+        strArgs = strKernel[intStart:intStop].split(',')
 
-                if intParentheses == 0:
-                    break
-                # end
+        assert(intArgs == len(strArgs) - 1)
 
-                intStop += 1
-            # end
+        strTensor = strArgs[0]
+        intStrides = objVariables[strTensor].stride()
 
-            intArgs = int(objMatch.group(2))
-            strArgs = strKernel[intStart:intStop].split(',')
+        strIndex = []
 
-            assert(intArgs == len(strArgs) - 1)
+        for intArg in range(intArgs):
+            strIndex.append('((' + strArgs[intArg + 1].replace('{', '(').replace('}', ')').strip() + ')*' + str(intStrides[intArg] if torch.is_tensor(intStrides[intArg]) == False else intStrides[intArg].item()) + ')')
+        # end
 
-            strTensor = strArgs[0]
-            intStrides = objVariables[strTensor].stride()
+        strKernel = strKernel.replace('OFFSET_' + str(intArgs) + '(' + strKernel[intStart:intStop] + ')', '(' + str.join('+', strIndex) + ')')
+    # end
 
-            strIndex = []
+    while True:
+        objMatch = re.search('(VALUE_)([0-4])(\()', strKernel)
 
-            for intArg in range(intArgs):
-                strIndex.append('((' + strArgs[intArg + 1].replace('{', '(').replace('}', ')').strip() + ')*' + str(intStrides[intArg] if torch.is_tensor(intStrides[intArg]) == False else intStrides[intArg].item()) + ')')
+        if objMatch is None:
+            break
+        # end
+
+        intStart = objMatch.span()[1]
+        intStop = objMatch.span()[1]
+        intParentheses = 1
+
+        while True:
+            intParentheses += 1 if strKernel[intStop] == '(' else 0
+            intParentheses -= 1 if strKernel[intStop] == ')' else 0
+
+            if intParentheses == 0:
+                break
             # end
 
-            strKernel = strKernel.replace('VALUE_' + str(intArgs) + '(' + strKernel[intStart:intStop] + ')', strTensor + '[' + str.join('+', strIndex) + ']')
+            intStop += 1
         # end
 
-        objCudacache[strKey] = {
-            'strFunction': strFunction,
-            'strKernel': strKernel
-        }
+        intArgs = int(objMatch.group(2))
+        strArgs = strKernel[intStart:intStop].split(',')
+
+        assert(intArgs == len(strArgs) - 1)
+
+        strTensor = strArgs[0]
+        intStrides = objVariables[strTensor].stride()
+
+        strIndex = []
+
+        for intArg in range(intArgs):
+            strIndex.append('((' + strArgs[intArg + 1].replace('{', '(').replace('}', ')').strip() + ')*' + str(intStrides[intArg] if torch.is_tensor(intStrides[intArg]) == False else intStrides[intArg].item()) + ')')
+        # end
+
+        strKernel = strKernel.replace('VALUE_' + str(intArgs) + '(' + strKernel[intStart:intStop] + ')', strTensor + '[' + str.join('+', strIndex) + ']')
     # end
 
-    return strKey
+    return strKernel
 # end
 
 
-@cupy.memoize(for_each_device=True)
 def cuda_launch(strKey:str):
+    cuda_import()
+
+    if 'launch' not in objCudacache:
+        objCudacache['launch'] = cupy.memoize(for_each_device=True)(cuda_compile)
+    # end
+
+    return objCudacache['launch'](strKey)
+# end
+
+
+def cuda_compile(strKey:str):
     if 'CUDA_HOME' not in os.environ:
         os.environ['CUDA_HOME'] = cupy.cuda.get_cuda_path()
     # end
@@ -229,13 +422,203 @@ def cuda_launch(strKey:str):
 ##########################################################
 
 
+def memory_format(tenIn:torch.Tensor):
+    # the outputs follow the memory format of the inputs, such that channels last inputs are neither converted nor produce outputs that need to be
+
+    if tenIn.is_contiguous(memory_format=torch.channels_last) == True and tenIn.is_contiguous() == False:
+        return torch.channels_last
+    # end
+
+    return torch.contiguous_format
+# end
+
+
+def cpu_tiles(tenIn:torch.Tensor, tenVer:torch.Tensor, tenHor:torch.Tensor, intTile:typing.Optional[int]):
+    # splits the output into tiles of at most intTile pixels, preferring full-width row bands, such that the gathered neighborhoods stay bounded
+
+    intHeight = tenVer.shape[2] and tenHor.shape[2]
+    intWidth = tenVer.shape[3] and tenHor.shape[3]
+
+    if intTile is None:
+        intTile = intCpubudget // (2 * tenIn.shape[0] * tenIn.shape[1] * tenVer.shape[1] * tenHor.shape[1] * tenIn.element_size()) # the gathered neighborhoods and their reordered copy within einsum
+    # end
+
+    intCols = min(intWidth, max(1, intTile))
+    intRows = min(intHeight, max(1, intTile // intCols))
+
+    for intY in range(0, intHeight, intRows):
+        for intX in range(0, intWidth, intCols):
+            yield intY, intX, min(intRows, intHeight - intY), min(intCols, intWidth - intX)
+        # end
+    # end
+# end
+
+
+def cpu_sepconv_out(tenIn:torch.Tensor, tenVer:torch.Tensor, tenHor:torch.Tensor, intTile:typing.Optional[int]=None):
+    # mirrors the sepconv_out kernel, gathering the neighborhood of every output pixel through unfold instead of looping over the pixels
+
+    intBatch = tenIn.shape[0]
+    intChans = tenIn.shape[1]
+    intVer = tenVer.shape[1]
+    intHor = tenHor.shape[1]
+
+    tenOut = torch.empty([intBatch, intChans, tenVer.shape[2] and tenHor.shape[2], tenVer.shape[3] and tenHor.shape[3]], dtype=tenIn.dtype, device=tenIn.device, memory_format=memory_format(tenIn))
+
+    for intY, intX, intRows, intCols in cpu_tiles(tenIn, tenVer, tenHor, intTile):
+        tenPatch = torch.nn.functional.unfold(input=tenIn[:, :, intY:intY + intRows + intVer - 1, intX:intX + intCols + intHor - 1], kernel_size=[intVer, intHor]).view(intBatch, intChans, intVer, intHor, intRows, intCols)
+
+        tenOut[:, :, intY:intY + intRows, intX:intX + intCols] = torch.einsum('ncvhyx,nvyx,nhyx->ncyx', tenPatch, tenVer[:, :, intY:intY + intRows, intX:intX + intCols], tenHor[:, :, intY:intY + intRows, intX:intX + intCols])
+    # end
+
+    return tenOut
+# end
+
+
+def cpu_sepconv_grad(tenIn:torch.Tensor, tenVer:torch.Tensor, tenHor:torch.Tensor, tenOutgrad:torch.Tensor, tenIngrad:typing.Optional[torch.Tensor], tenVergrad:typing.Optional[torch.Tensor], tenHorgrad:typing.Optional[torch.Tensor], intTile:typing.Optional[int]=None):
+    # computes what the sepconv_ingrad, sepconv_vergrad, and sepconv_horgrad kernels do in a single pass, the gradients that are None are skipped
+
+    intBatch = tenIn.shape[0]
+    intChans = tenIn.shape[1]
+    intVer = tenVer.shape[1]
+    intHor = tenHor.shape[1]
+
+    for intY, intX, intRows, intCols in cpu_tiles(tenIn, tenVer, tenHor, intTile):
+        tenTilever = tenVer[:, :, intY:intY + intRows, intX:intX + intCols]
+        tenTilehor = tenHor[:, :, intY:intY + intRows, intX:intX + intCols]
+        tenTileoutgrad = tenOutgrad[:, :, intY:intY + intRows, intX:intX + intCols]
+
+        if tenVergrad is not None or tenHorgrad is not None:
+            tenPatch = torch.nn.functional.unfold(input=tenIn[:, :, intY:intY + intRows + intVer - 1, intX:intX + intCols + intHor - 1], kernel_size=[intVer, intHor]).view(intBatch, intChans, intVer, intHor, intRows, intCols)
+
+            tenPatchgrad = torch.einsum('ncvhyx,ncyx->nvhyx', tenPatch, tenTileoutgrad) # shared by both kernel gradients
+
+            if tenVergrad is not None:
+                tenVergrad[:, :, intY:intY + intRows, intX:intX + intCols] = torch.einsum('nvhyx,nhyx->nvyx', tenPatchgrad, tenTilehor)
+            # end
+
+            if tenHorgrad is not None:
+                tenHorgrad[:, :, intY:intY + intRows, intX:intX + intCols] = torch.einsum('nvhyx,nvyx->nhyx', tenPatchgrad, tenTilever)
+            # end
+        # end
+
+        if tenIngrad is not None:
+            tenPatchgrad = torch.einsum('ncyx,nvyx,nhyx->ncvhyx', tenTileoutgrad, tenTilever, tenTilehor).reshape(intBatch, intChans * intVer * intHor, intRows * intCols)
+
+            tenIngrad[:, :, intY:intY + intRows + intVer - 1, intX:intX + intCols + intHor - 1] += torch.nn.functional.fold(input=tenPatchgrad, output_size=[intRows + intVer - 1, intCols + intHor - 1], kernel_size=[intVer, intHor]) # neighboring tiles overlap in the input
+        # end
+    # end
+# end
+
+
+def separable_sepconv_out(tenIn:torch.Tensor, tenVer:torch.Tensor, tenHor:torch.Tensor, intTile:typing.Optional[int]=None):
+    # computes the same as sepconv_out in two stages, every kernel row is first reduced horizontally and the result is then weighted vertically, such that only one partial sum per pixel is held instead of the intVer * intHor products
+    # every step is an elementwise multiply-add over the whole tile, which makes this work on any device without gathering neighborhoods
+
+    intBatch = tenIn.shape[0]
+    intChans = tenIn.shape[1]
+    intVer = tenVer.shape[1]
+    intHor = tenHor.shape[1]
+
+    if intTile is None:
+        intTile = intCpucache // (intBatch * intChans * tenIn.element_size()) if tenIn.is_cuda == False else tenVer.shape[2] * tenVer.shape[3] # a single tile on the gpu, where the number of launches matters more than the cache
+    # end
+
+    tenOut = torch.empty([intBatch, intChans, tenVer.shape[2] and tenHor.shape[2], tenVer.shape[3] and tenHor.shape[3]], dtype=tenIn.dtype, device=tenIn.device, memory_format=memory_format(tenIn))
+
+    for intY, intX, intRows, intCols in cpu_tiles(tenIn, tenVer, tenHor, intTile):
+        # inputs in channels last order are transposed one tile at a time, such that every tap is read as a plane while the tile is in the cache
+
+        tenTilein = tenIn[:, :, intY:intY + intRows + intVer - 1, intX:intX + intCols + intHor - 1].contiguous()
+        tenTilever = tenVer[:, :, intY:intY + intRows, intX:intX + intCols].contiguous()
+        tenTilehor = tenHor[:, :, intY:intY + intRows, intX:intX + intCols].contiguous()
+        tenTileout = tenIn.new_zeros([intBatch, intChans, intRows, intCols])
+        tenPartial = tenIn.new_empty([intBatch, intChans, intRows, intCols])
+
+        for intFy in range(intVer):
+            torch.mul(tenTilein[:, :, intFy:intFy + intRows, 0:intCols], tenTilehor[:, 0:1, :, :], out=tenPartial)
+
+            for intFx in range(1, intHor):
+                tenPartial.addcmul_(tenTilein[:, :, intFy:intFy + intRows, intFx:intFx + intCols], tenTilehor[:, intFx:intFx + 1, :, :])
+            # end
+
+            tenTileout.addcmul_(tenPartial, tenTilever[:, intFy:intFy + 1, :, :])
+        # end
+
+        tenOut[:, :, intY:intY + intRows, intX:intX + intCols] = tenTileout
+    # end
+
+    return tenOut
+# end
+
+
+def separable_sepconv_pair(tenOne:torch.Tensor, tenTwo:torch.Tensor, tenVerone:torch.Tensor, tenHorone:torch.Tensor, tenVertwo:torch.Tensor, tenHortwo:torch.Tensor, intTile:typing.Optional[int]=None):
+    # the separable algorithm for both frames at once, the replicate padding is applied to one tile at a time through clamped indices and the result is divided by the normalizer as is
+
+    intBatch = tenOne.shape[0]
+    intChans = tenOne.shape[1]
+    intVer = tenVerone.shape[1]
+    intHor = tenHorone.shape[1]
+
+    if intTile is None:
+        intTile = intCpucache // (intBatch * intChans * tenOne.element_size()) if tenOne.is_cuda == False else tenVerone.shape[2] * tenVerone.shape[3] # the frames take turns, such that they share the same partial sums and hence the same tile size as in separable_sepconv_out
+    # end
+
+    tenOut = torch.empty([intBatch, intChans, tenVerone.shape[2], tenVerone.shape[3]], dtype=tenOne.dtype, device=tenOne.device, memory_format=memory_format(tenOne))
+
+    for intY, intX, intRows, intCols in cpu_tiles(tenOne, tenVerone, tenHorone, intTile):
+        tenRows = torch.arange(intY - ((intVer - 1) // 2), intY + intRows + ((intVer - 1) // 2), device=tenOne.device).clamp(0, tenOne.shape[2] - 1)
+        tenCols = torch.arange(intX - ((intHor - 1) // 2), intX + intCols + ((intHor - 1) // 2), device=tenOne.device).clamp(0, tenOne.shape[3] - 1)
+
+        tenTileout = tenOne.new_zeros([intBatch, intChans, intRows, intCols])
+        tenNormalize = tenOne.new_zeros([intBatch, 1, intRows, intCols])
+        tenPartial = tenOne.new_empty([intBatch, intChans, intRows, intCols])
+
+        for tenIn, tenVer, tenHor in [(tenOne, tenVerone, tenHorone), (tenTwo, tenVertwo, tenHortwo)]:
+            tenTilein = tenIn.index_select(2, tenRows).index_select(3, tenCols).contiguous()
+            tenTilever = tenVer[:, :, intY:intY + intRows, intX:intX + intCols].contiguous()
+            tenTilehor = tenHor[:, :, intY:intY + intRows, intX:intX + intCols].contiguous()
+
+            for intFy in range(intVer):
+                torch.mul(tenTilein[:, :, intFy:intFy + intRows, 0:intCols], tenTilehor[:, 0:1, :, :], out=tenPartial)
+
+                for intFx in range(1, intHor):
+                    tenPartial.addcmul_(tenTilein[:, :, intFy:intFy + intRows, intFx:intFx + intCols], tenTilehor[:, intFx:intFx + 1, :, :])
+                # end
+
+                tenTileout.addcmul_(tenPartial, tenTilever[:, intFy:intFy + 1, :, :])
+            # end
+
+            tenNormalize.addcmul_(tenTilever.sum(1, True), tenTilehor.sum(1, True)) # what filtering a constant one yields, which the replicate padding keeps constant
+        # end
+
+        tenNormalize[tenNormalize.abs() < 0.01] = 1.0
+
+        tenOut[:, :, intY:intY + intRows, intX:intX + intCols] = tenTileout / tenNormalize
+    # end
+
+    return tenOut
+# end
+
+
+##########################################################
+
+
 class sepconv_func(torch.autograd.Function):
     @staticmethod
     @torch.cuda.amp.custom_fwd(cast_inputs=torch.float32)
-    def forward(self, tenIn, tenVer, tenHor):
-        tenOut = tenIn.new_zeros([tenIn.shape[0], tenIn.shape[1], tenVer.shape[2] and tenHor.shape[2], tenVer.shape[3] and tenHor.shape[3]])
+    def forward(self, tenIn, tenVer, tenHor, intTile:typing.Optional[int]=None, strAlgorithm:typing.Optional[str]=None):
+        if strAlgorithm is None:
+            strAlgorithm = 'direct' if tenIn.is_cuda == True else 'separable' # the kahan-summed kernel on the gpu, the two stages are considerably faster on the cpu
+        # end
+
+        assert(strAlgorithm in ['direct', 'separable'])
+
+        if strAlgorithm == 'separable':
+            tenOut = separable_sepconv_out(tenIn, tenVer, tenHor, intTile)
+
+        elif tenIn.is_cuda == True:
+            tenOut = torch.empty([tenIn.shape[0], tenIn.shape[1], tenVer.shape[2] and tenHor.shape[2], tenVer.shape[3] and tenHor.shape[3]], dtype=tenIn.dtype, device=tenIn.device, memory_format=memory_format(tenIn)).zero_()
 
-        if tenIn.is_cuda == True:
             cuda_launch(cuda_kernel('sepconv_out', '''
                 extern "C" __global__ void __launch_bounds__(512) sepconv_out(
                     const int n,
@@ -265,7 +648,7 @@ class sepconv_func(torch.autograd.Function):
                         }
                     }
 
-                    tenOut[intIndex] = fltOut;
+                    tenOut[OFFSET_4(tenOut, intN, intC, intY, intX)] = fltOut;
                 } }
             ''', {
                 'tenIn': tenIn,
@@ -280,12 +663,14 @@ class sepconv_func(torch.autograd.Function):
             )
 
         elif tenIn.is_cuda != True:
-            assert(False)
+            tenOut = cpu_sepconv_out(tenIn, tenVer, tenHor, intTile)
 
         # end
 
         self.save_for_backward(tenIn, tenVer, tenHor)
 
+        self.intTile = intTile
+
         return tenOut
     # end
 
@@ -294,175 +679,403 @@ class sepconv_func(torch.autograd.Function):
     def backward(self, tenOutgrad):
         tenIn, tenVer, tenHor = self.saved_tensors
 
-        tenOutgrad = tenOutgrad.contiguous(); assert(tenOutgrad.is_cuda == True)
-
         tenIngrad = tenIn.new_zeros([tenIn.shape[0], tenIn.shape[1], tenIn.shape[2], tenIn.shape[3]]) if self.needs_input_grad[0] == True else None
         tenVergrad = tenVer.new_zeros([tenVer.shape[0], tenVer.shape[1], tenVer.shape[2], tenVer.shape[3]]) if self.needs_input_grad[1] == True else None
         tenHorgrad = tenHor.new_zeros([tenHor.shape[0], tenHor.shape[1], tenHor.shape[2], tenHor.shape[3]]) if self.needs_input_grad[2] == True else None
 
-        if tenIngrad is not None:
-            cuda_launch(cuda_kernel('sepconv_ingrad', '''
-                extern "C" __global__ void __launch_bounds__(512) sepconv_ingrad(
-                    const int n,
-                    const {{type}}* __restrict__ tenIn,
-                    const {{type}}* __restrict__ tenVer,
-                    const {{type}}* __restrict__ tenHor,
-                    const {{type}}* __restrict__ tenOutgrad,
-                    {{type}}* __restrict__ tenIngrad,
-                    {{type}}* __restrict__ tenVergrad,
-                    {{type}}* __restrict__ tenHorgrad
-                ) { for (int intIndex = (blockIdx.x * blockDim.x) + threadIdx.x; intIndex < n; intIndex += blockDim.x * gridDim.x) {
-                    const int intN = ( intIndex / SIZE_3(tenIngrad) / SIZE_2(tenIngrad) / SIZE_1(tenIngrad) ) % SIZE_0(tenIngrad);
-                    const int intC = ( intIndex / SIZE_3(tenIngrad) / SIZE_2(tenIngrad)                     ) % SIZE_1(tenIngrad);
-                    const int intY = ( intIndex / SIZE_3(tenIngrad)                                         ) % SIZE_2(tenIngrad);
-                    const int intX = ( intIndex                                                             ) % SIZE_3(tenIngrad);
+        if tenOutgrad.is_cuda == True:
+            if tenIngrad is not None:
+                cuda_launch(cuda_kernel('sepconv_ingrad', '''
+                    extern "C" __global__ void __launch_bounds__(512) sepconv_ingrad(
+                        const int n,
+                        const {{type}}* __restrict__ tenIn,
+                        const {{type}}* __restrict__ tenVer,
+                        const {{type}}* __restrict__ tenHor,
+                        const {{type}}* __restrict__ tenOutgrad,
+                        {{type}}* __restrict__ tenIngrad,
+                        {{type}}* __restrict__ tenVergrad,
+                        {{type}}* __restrict__ tenHorgrad
+                    ) { for (int intIndex = (blockIdx.x * blockDim.x) + threadIdx.x; intIndex < n; intIndex += blockDim.x * gridDim.x) {
+                        const int intN = ( intIndex / SIZE_3(tenIngrad) / SIZE_2(tenIngrad) / SIZE_1(tenIngrad) ) % SIZE_0(tenIngrad);
+                        const int intC = ( intIndex / SIZE_3(tenIngrad) / SIZE_2(tenIngrad)                     ) % SIZE_1(tenIngrad);
+                        const int intY = ( intIndex / SIZE_3(tenIngrad)                                         ) % SIZE_2(tenIngrad);
+                        const int intX = ( intIndex                                                             ) % SIZE_3(tenIngrad);
+
+                        {{type}} fltIngrad = 0.0f;
+
+                        {{type}} fltKahanc = 0.0f;
+                        {{type}} fltKahany = 0.0f;
+                        {{type}} fltKahant = 0.0f;
 
-                    {{type}} fltIngrad = 0.0f;
+                        for (int intFy = 0; intFy < SIZE_1(tenVer); intFy += 1) {
+                            int intKy = intY + intFy - (SIZE_1(tenVer) - 1);
 
-                    {{type}} fltKahanc = 0.0f;
-                    {{type}} fltKahany = 0.0f;
-                    {{type}} fltKahant = 0.0f;
+                            if (intKy < 0) { continue; }
+                            if (intKy >= SIZE_2(tenVer)) { continue; }
 
-                    for (int intFy = 0; intFy < SIZE_1(tenVer); intFy += 1) {
-                        int intKy = intY + intFy - (SIZE_1(tenVer) - 1);
+                            for (int intFx = 0; intFx < SIZE_1(tenHor); intFx += 1) {
+                                int intKx = intX + intFx - (SIZE_1(tenHor) - 1);
 
-                        if (intKy < 0) { continue; }
-                        if (intKy >= SIZE_2(tenVer)) { continue; }
+                                if (intKx < 0) { continue; }
+                                if (intKx >= SIZE_3(tenHor)) { continue; }
 
-                        for (int intFx = 0; intFx < SIZE_1(tenHor); intFx += 1) {
-                            int intKx = intX + intFx - (SIZE_1(tenHor) - 1);
+                                fltKahany = VALUE_4(tenVer, intN, (SIZE_1(tenVer) - 1) - intFy, intKy, intKx) * VALUE_4(tenHor, intN, (SIZE_1(tenHor) - 1) - intFx, intKy, intKx) * VALUE_4(tenOutgrad, intN, intC, intKy, intKx);
+                                fltKahany = fltKahany - fltKahanc;
+                                fltKahant = fltIngrad + fltKahany;
+                                fltKahanc = (fltKahant - fltIngrad) - fltKahany;
+                                fltIngrad = fltKahant;
+                            }
+                        }
 
-                            if (intKx < 0) { continue; }
-                            if (intKx >= SIZE_3(tenHor)) { continue; }
+                        tenIngrad[intIndex] = fltIngrad;
+                    } }
+                ''', {
+                    'tenIn': tenIn,
+                    'tenVer': tenVer,
+                    'tenHor': tenHor,
+                    'tenOutgrad': tenOutgrad,
+                    'tenIngrad': tenIngrad,
+                    'tenVergrad': tenVergrad,
+                    'tenHorgrad': tenHorgrad
+                }))(
+                    grid=tuple([int((tenIngrad.nelement() + 512 - 1) / 512), 1, 1]),
+                    block=tuple([512, 1, 1]),
+                    args=[cuda_int32(tenIngrad.nelement()), tenIn.data_ptr(), tenVer.data_ptr(), tenHor.data_ptr(), tenOutgrad.data_ptr(), tenIngrad.data_ptr(), None, None],
+                    stream=collections.namedtuple('Stream', 'ptr')(torch.cuda.current_stream().cuda_stream)
+                )
+            # end
 
-                            fltKahany = VALUE_4(tenVer, intN, (SIZE_1(tenVer) - 1) - intFy, intKy, intKx) * VALUE_4(tenHor, intN, (SIZE_1(tenHor) - 1) - intFx, intKy, intKx) * VALUE_4(tenOutgrad, intN, intC, intKy, intKx);
-                            fltKahany = fltKahany - fltKahanc;
-                            fltKahant = fltIngrad + fltKahany;
-                            fltKahanc = (fltKahant - fltIngrad) - fltKahany;
-                            fltIngrad = fltKahant;
+            if tenVergrad is not None:
+                cuda_launch(cuda_kernel('sepconv_vergrad', '''
+                    extern "C" __global__ void __launch_bounds__(512) sepconv_vergrad(
+                        const int n,
+                        const {{type}}* __restrict__ tenIn,
+                        const {{type}}* __restrict__ tenVer,
+                        const {{type}}* __restrict__ tenHor,
+                        const {{type}}* __restrict__ tenOutgrad,
+                        {{type}}* __restrict__ tenIngrad,
+                        {{type}}* __restrict__ tenVergrad,
+                        {{type}}* __restrict__ tenHorgrad
+                    ) { for (int intIndex = (blockIdx.x * blockDim.x) + threadIdx.x; intIndex < n; intIndex += blockDim.x * gridDim.x) {
+                        const int intN = ( intIndex / SIZE_3(tenVergrad) / SIZE_2(tenVergrad) / SIZE_1(tenVergrad) ) % SIZE_0(tenVergrad);
+                        const int intC = ( intIndex / SIZE_3(tenVergrad) / SIZE_2(tenVergrad)                      ) % SIZE_1(tenVergrad);
+                        const int intY = ( intIndex / SIZE_3(tenVergrad)                                           ) % SIZE_2(tenVergrad);
+                        const int intX = ( intIndex                                                                ) % SIZE_3(tenVergrad);
+
+                        {{type}} fltVergrad = 0.0f;
+
+                        {{type}} fltKahanc = 0.0f;
+                        {{type}} fltKahany = 0.0f;
+                        {{type}} fltKahant = 0.0f;
+
+                        for (int intI = 0; intI < SIZE_1(tenIn); intI += 1) {
+                            for (int intFx = 0; intFx < SIZE_1(tenHor); intFx += 1) {
+                                fltKahany = VALUE_4(tenHor, intN, intFx, intY, intX) * VALUE_4(tenIn, intN, intI, intY + intC, intX + intFx) * VALUE_4(tenOutgrad, intN, intI, intY, intX);
+                                fltKahany = fltKahany - fltKahanc;
+                                fltKahant = fltVergrad + fltKahany;
+                                fltKahanc = (fltKahant - fltVergrad) - fltKahany;
+                                fltVergrad = fltKahant;
+                            }
                         }
-                    }
 
-                    tenIngrad[intIndex] = fltIngrad;
-                } }
-            ''', {
-                'tenIn': tenIn,
-                'tenVer': tenVer,
-                'tenHor': tenHor,
-                'tenOutgrad': tenOutgrad,
-                'tenIngrad': tenIngrad,
-                'tenVergrad': tenVergrad,
-                'tenHorgrad': tenHorgrad
-            }))(
-                grid=tuple([int((tenIngrad.nelement() + 512 - 1) / 512), 1, 1]),
-                block=tuple([512, 1, 1]),
-                args=[cuda_int32(tenIngrad.nelement()), tenIn.data_ptr(), tenVer.data_ptr(), tenHor.data_ptr(), tenOutgrad.data_ptr(), tenIngrad.data_ptr(), None, None],
-                stream=collections.namedtuple('Stream', 'ptr')(torch.cuda.current_stream().cuda_stream)
-            )
+                        tenVergrad[intIndex] = fltVergrad;
+                    } }
+                ''', {
+                    'tenIn': tenIn,
+                    'tenVer': tenVer,
+                    'tenHor': tenHor,
+                    'tenOutgrad': tenOutgrad,
+                    'tenIngrad': tenIngrad,
+                    'tenVergrad': tenVergrad,
+                    'tenHorgrad': tenHorgrad
+                }))(
+                    grid=tuple([int((tenVergrad.nelement() + 512 - 1) / 512), 1, 1]),
+                    block=tuple([512, 1, 1]),
+                    args=[cuda_int32(tenVergrad.nelement()), tenIn.data_ptr(), tenVer.data_ptr(), tenHor.data_ptr(), tenOutgrad.data_ptr(), None, tenVergrad.data_ptr(), None],
+                    stream=collections.namedtuple('Stream', 'ptr')(torch.cuda.current_stream().cuda_stream)
+                )
+            # end
+
+            if tenHorgrad is not None:
+                cuda_launch(cuda_kernel('sepconv_horgrad', '''
+                    extern "C" __global__ void __launch_bounds__(512) sepconv_horgrad(
+                        const int n,
+                        const {{type}}* __restrict__ tenIn,
+                        const {{type}}* __restrict__ tenVer,
+                        const {{type}}* __restrict__ tenHor,
+                        const {{type}}* __restrict__ tenOutgrad,
+                        {{type}}* __restrict__ tenIngrad,
+                        {{type}}* __restrict__ tenVergrad,
+                        {{type}}* __restrict__ tenHorgrad
+                    ) { for (int intIndex = (blockIdx.x * blockDim.x) + threadIdx.x; intIndex < n; intIndex += blockDim.x * gridDim.x) {
+                        const int intN = ( intIndex / SIZE_3(tenHorgrad) / SIZE_2(tenHorgrad) / SIZE_1(tenHorgrad) ) % SIZE_0(tenHorgrad);
+                        const int intC = ( intIndex / SIZE_3(tenHorgrad) / SIZE_2(tenHorgrad)                      ) % SIZE_1(tenHorgrad);
+                        const int intY = ( intIndex / SIZE_3(tenHorgrad)                                           ) % SIZE_2(tenHorgrad);
+                        const int intX = ( intIndex                                                                ) % SIZE_3(tenHorgrad);
+
+                        {{type}} fltHorgrad = 0.0f;
+
+                        {{type}} fltKahanc = 0.0f;
+                        {{type}} fltKahany = 0.0f;
+                        {{type}} fltKahant = 0.0f;
+
+                        for (int intI = 0; intI < SIZE_1(tenIn); intI += 1) {
+                            for (int intFy = 0; intFy < SIZE_1(tenVer); intFy += 1) {
+                                fltKahany = VALUE_4(tenVer, intN, intFy, intY, intX) * VALUE_4(tenIn, intN, intI, intY + intFy, intX + intC) * VALUE_4(tenOutgrad, intN, intI, intY, intX);
+                                fltKahany = fltKahany - fltKahanc;
+                                fltKahant = fltHorgrad + fltKahany;
+                                fltKahanc = (fltKahant - fltHorgrad) - fltKahany;
+                                fltHorgrad = fltKahant;
+                            }
+                        }
+
+                        tenHorgrad[intIndex] = fltHorgrad;
+                    } }
+                ''', {
+                    'tenIn': tenIn,
+                    'tenVer': tenVer,
+                    'tenHor': tenHor,
+                    'tenOutgrad': tenOutgrad,
+                    'tenIngrad': tenIngrad,
+                    'tenVergrad': tenVergrad,
+                    'tenHorgrad': tenHorgrad
+                }))(
+                    grid=tuple([int((tenHorgrad.nelement() + 512 - 1) / 512), 1, 1]),
+                    block=tuple([512, 1, 1]),
+                    args=[cuda_int32(tenHorgrad.nelement()), tenIn.data_ptr(), tenVer.data_ptr(), tenHor.data_ptr(), tenOutgrad.data_ptr(), None, None, tenHorgrad.data_ptr()],
+                    stream=collections.namedtuple('Stream', 'ptr')(torch.cuda.current_stream().cuda_stream)
+                )
+            # end
+
+        elif tenOutgrad.is_cuda != True:
+            cpu_sepconv_grad(tenIn, tenVer, tenHor, tenOutgrad, tenIngrad, tenVergrad, tenHorgrad, self.intTile)
+
         # end
 
-        if tenVergrad is not None:
-            cuda_launch(cuda_kernel('sepconv_vergrad', '''
-                extern "C" __global__ void __launch_bounds__(512) sepconv_vergrad(
-                    const int n,
-                    const {{type}}* __restrict__ tenIn,
-                    const {{type}}* __restrict__ tenVer,
-                    const {{type}}* __restrict__ tenHor,
-                    const {{type}}* __restrict__ tenOutgrad,
-                    {{type}}* __restrict__ tenIngrad,
-                    {{type}}* __restrict__ tenVergrad,
-                    {{type}}* __restrict__ tenHorgrad
-                ) { for (int intIndex = (blockIdx.x * blockDim.x) + threadIdx.x; intIndex < n; intIndex += blockDim.x * gridDim.x) {
-                    const int intN = ( intIndex / SIZE_3(tenVergrad) / SIZE_2(tenVergrad) / SIZE_1(tenVergrad) ) % SIZE_0(tenVergrad);
-                    const int intC = ( intIndex / SIZE_3(tenVergrad) / SIZE_2(tenVergrad)                      ) % SIZE_1(tenVergrad);
-                    const int intY = ( intIndex / SIZE_3(tenVergrad)                                           ) % SIZE_2(tenVergrad);
-                    const int intX = ( intIndex                                                                ) % SIZE_3(tenVergrad);
+        return tenIngrad, tenVergrad, tenHorgrad, None, None
+    # end
+# end
 
-                    {{type}} fltVergrad = 0.0f;
 
-                    {{type}} fltKahanc = 0.0f;
-                    {{type}} fltKahany = 0.0f;
-                    {{type}} fltKahant = 0.0f;
+def reference_sepconv_pair(tenOne:torch.Tensor, tenTwo:torch.Tensor, tenVerone:torch.Tensor, tenHorone:torch.Tensor, tenVertwo:torch.Tensor, tenHortwo:torch.Tensor):
+    # what sepconv_pair_func computes, spelled out through padded copies of the frames with a channel of ones that yields the normalizer
 
-                    for (int intI = 0; intI < SIZE_1(tenIn); intI += 1) {
-                        for (int intFx = 0; intFx < SIZE_1(tenHor); intFx += 1) {
-                            fltKahany = VALUE_4(tenHor, intN, intFx, intY, intX) * VALUE_4(tenIn, intN, intI, intY + intC, intX + intFx) * VALUE_4(tenOutgrad, intN, intI, intY, intX);
-                            fltKahany = fltKahany - fltKahanc;
-                            fltKahant = fltVergrad + fltKahany;
-                            fltKahanc = (fltKahant - fltVergrad) - fltKahany;
-                            fltVergrad = fltKahant;
-                        }
-                    }
+    tenOut = []
 
-                    tenVergrad[intIndex] = fltVergrad;
-                } }
-            ''', {
-                'tenIn': tenIn,
-                'tenVer': tenVer,
-                'tenHor': tenHor,
-                'tenOutgrad': tenOutgrad,
-                'tenIngrad': tenIngrad,
-                'tenVergrad': tenVergrad,
-                'tenHorgrad': tenHorgrad
-            }))(
-                grid=tuple([int((tenVergrad.nelement() + 512 - 1) / 512), 1, 1]),
-                block=tuple([512, 1, 1]),
-                args=[cuda_int32(tenVergrad.nelement()), tenIn.data_ptr(), tenVer.data_ptr(), tenHor.data_ptr(), tenOutgrad.data_ptr(), None, tenVergrad.data_ptr(), None],
-                stream=collections.namedtuple('Stream', 'ptr')(torch.cuda.current_stream().cuda_stream)
-            )
+    for tenIn, tenVer, tenHor in [(tenOne, tenVerone, tenHorone), (tenTwo, tenVertwo, tenHortwo)]:
+        tenIn = torch.nn.functional.pad(input=torch.cat([tenIn, tenIn.new_ones([tenIn.shape[0], 1, tenIn.shape[2], tenIn.shape[3]])], 1), pad=[(tenHor.shape[1] - 1) // 2, (tenHor.shape[1] - 1) // 2, (tenVer.shape[1] - 1) // 2, (tenVer.shape[1] - 1) // 2], mode='replicate')
+
+        tenOut.append(sepconv_func.apply(tenIn, tenVer, tenHor))
+    # end
+
+    tenOut = tenOut[0] + tenOut[1]
+
+    tenNormalize = tenOut[:, -1:, :, :]
+    tenNormalize = torch.where(tenNormalize.abs() < 0.01, torch.ones_like(tenNormalize), tenNormalize)
+
+    return tenOut[:, :-1, :, :] / tenNormalize
+# end
+
+
+class sepconv_pair_func(torch.autograd.Function):
+    # synthesizes the normalized frame from both unpadded frames and all four kernels in a single op, neither the padded frames with their channel of ones nor the two unnormalized results are allocated
+    # the backward pass is rare enough to recompute the forward pass through reference_sepconv_pair and differentiate that
+
+    @staticmethod
+    @torch.cuda.amp.custom_fwd(cast_inputs=torch.float32)
+    def forward(self, tenOne, tenTwo, tenVerone, tenHorone, tenVertwo, tenHortwo, intTile:typing.Optional[int]=None, strAlgorithm:typing.Optional[str]=None):
+        assert(tenVerone.shape[1] % 2 == 1 and tenHorone.shape[1] % 2 == 1) # the padding is symmetric
+        assert(tenVerone.shape == tenVertwo.shape and tenHorone.shape == tenHortwo.shape)
+
+        if strAlgorithm is None:
+            strAlgorithm = 'direct' if tenOne.is_cuda == True else 'separable'
         # end
 
-        if tenHorgrad is not None:
-            cuda_launch(cuda_kernel('sepconv_horgrad', '''
-                extern "C" __global__ void __launch_bounds__(512) sepconv_horgrad(
+        assert(strAlgorithm in ['direct', 'separable'])
+        assert(strAlgorithm == 'separable' or tenOne.is_cuda == True) # the fused op has no direct implementation on the cpu
+
+        if strAlgorithm == 'separable':
+            tenOut = separable_sepconv_pair(tenOne, tenTwo, tenVerone, tenHorone, tenVertwo, tenHortwo, intTile)
+
+        elif tenOne.is_cuda == True:
+            tenOut = torch.empty([tenOne.shape[0], tenOne.shape[1], tenVerone.shape[2], tenVerone.shape[3]], dtype=tenOne.dtype, device=tenOne.device, memory_format=memory_format(tenOne))
+
+            cuda_launch(cuda_kernel('sepconv_pair_out', '''
+                extern "C" __global__ void __launch_bounds__(512) sepconv_pair_out(
                     const int n,
-                    const {{type}}* __restrict__ tenIn,
-                    const {{type}}* __restrict__ tenVer,
-                    const {{type}}* __restrict__ tenHor,
-                    const {{type}}* __restrict__ tenOutgrad,
-                    {{type}}* __restrict__ tenIngrad,
-                    {{type}}* __restrict__ tenVergrad,
-                    {{type}}* __restrict__ tenHorgrad
+                    const {{type}}* __restrict__ tenOne,
+                    const {{type}}* __restrict__ tenTwo,
+                    const {{type}}* __restrict__ tenVerone,
+                    const {{type}}* __restrict__ tenHorone,
+                    const {{type}}* __restrict__ tenVertwo,
+                    const {{type}}* __restrict__ tenHortwo,
+                    {{type}}* __restrict__ tenOut
                 ) { for (int intIndex = (blockIdx.x * blockDim.x) + threadIdx.x; intIndex < n; intIndex += blockDim.x * gridDim.x) {
-                    const int intN = ( intIndex / SIZE_3(tenHorgrad) / SIZE_2(tenHorgrad) / SIZE_1(tenHorgrad) ) % SIZE_0(tenHorgrad);
-                    const int intC = ( intIndex / SIZE_3(tenHorgrad) / SIZE_2(tenHorgrad)                      ) % SIZE_1(tenHorgrad);
-                    const int intY = ( intIndex / SIZE_3(tenHorgrad)                                           ) % SIZE_2(tenHorgrad);
-                    const int intX = ( intIndex                                                                ) % SIZE_3(tenHorgrad);
+                    const int intN = ( intIndex / SIZE_3(tenOut) / SIZE_2(tenOut) / SIZE_1(tenOut) ) % SIZE_0(tenOut);
+                    const int intC = ( intIndex / SIZE_3(tenOut) / SIZE_2(tenOut)                  ) % SIZE_1(tenOut);
+                    const int intY = ( intIndex / SIZE_3(tenOut)                                   ) % SIZE_2(tenOut);
+                    const int intX = ( intIndex                                                    ) % SIZE_3(tenOut);
 
-                    {{type}} fltHorgrad = 0.0f;
+                    {{type}} fltOut = 0.0f;
 
                     {{type}} fltKahanc = 0.0f;
                     {{type}} fltKahany = 0.0f;
                     {{type}} fltKahant = 0.0f;
 
-                    for (int intI = 0; intI < SIZE_1(tenIn); intI += 1) {
-                        for (int intFy = 0; intFy < SIZE_1(tenVer); intFy += 1) {
-                            fltKahany = VALUE_4(tenVer, intN, intFy, intY, intX) * VALUE_4(tenIn, intN, intI, intY + intFy, intX + intC) * VALUE_4(tenOutgrad, intN, intI, intY, intX);
+                    for (int intFy = 0; intFy < SIZE_1(tenVerone); intFy += 1) {
+                        const int intIy = min(max(intY + intFy - ((SIZE_1(tenVerone) - 1) / 2), 0), SIZE_2(tenOne) - 1);
+
+                        for (int intFx = 0; intFx < SIZE_1(tenHorone); intFx += 1) {
+                            const int intIx = min(max(intX + intFx - ((SIZE_1(tenHorone) - 1) / 2), 0), SIZE_3(tenOne) - 1);
+
+                            fltKahany = (VALUE_4(tenOne, intN, intC, intIy, intIx) * VALUE_4(tenVerone, intN, intFy, intY, intX) * VALUE_4(tenHorone, intN, intFx, intY, intX)) + (VALUE_4(tenTwo, intN, intC, intIy, intIx) * VALUE_4(tenVertwo, intN, intFy, intY, intX) * VALUE_4(tenHortwo, intN, intFx, intY, intX));
                             fltKahany = fltKahany - fltKahanc;
-                            fltKahant = fltHorgrad + fltKahany;
-                            fltKahanc = (fltKahant - fltHorgrad) - fltKahany;
-                            fltHorgrad = fltKahant;
+                            fltKahant = fltOut + fltKahany;
+                            fltKahanc = (fltKahant - fltOut) - fltKahany;
+                            fltOut = fltKahant;
                         }
                     }
 
-                    tenHorgrad[intIndex] = fltHorgrad;
+                    {{type}} fltVerone = 0.0f;
+                    {{type}} fltVertwo = 0.0f;
+
+                    for (int intFy = 0; intFy < SIZE_1(tenVerone); intFy += 1) {
+                        fltVerone += VALUE_4(tenVerone, intN, intFy, intY, intX);
+                        fltVertwo += VALUE_4(tenVertwo, intN, intFy, intY, intX);
+                    }
+
+                    {{type}} fltHorone = 0.0f;
+                    {{type}} fltHortwo = 0.0f;
+
+                    for (int intFx = 0; intFx < SIZE_1(tenHorone); intFx += 1) {
+                        fltHorone += VALUE_4(tenHorone, intN, intFx, intY, intX);
+                        fltHortwo += VALUE_4(tenHortwo, intN, intFx, intY, intX);
+                    }
+
+                    {{type}} fltNormalize = (fltVerone * fltHorone) + (fltVertwo * fltHortwo);
+
+                    if (fabs(fltNormalize) < 0.01f) { fltNormalize = 1.0f; }
+
+                    tenOut[OFFSET_4(tenOut, intN, intC, intY, intX)] = fltOut / fltNormalize;
                 } }
             ''', {
-                'tenIn': tenIn,
-                'tenVer': tenVer,
-                'tenHor': tenHor,
-                'tenOutgrad': tenOutgrad,
-                'tenIngrad': tenIngrad,
-                'tenVergrad': tenVergrad,
-                'tenHorgrad': tenHorgrad
+                'tenOne': tenOne,
+                'tenTwo': tenTwo,
+                'tenVerone': tenVerone,
+                'tenHorone': tenHorone,
+                'tenVertwo': tenVertwo,
+                'tenHortwo': tenHortwo,
+                'tenOut': tenOut
             }))(
-                grid=tuple([int((tenHorgrad.nelement() + 512 - 1) / 512), 1, 1]),
+                grid=tuple([int((tenOut.nelement() + 512 - 1) / 512), 1, 1]),
                 block=tuple([512, 1, 1]),
-                args=[cuda_int32(tenHorgrad.nelement()), tenIn.data_ptr(), tenVer.data_ptr(), tenHor.data_ptr(), tenOutgrad.data_ptr(), None, None, tenHorgrad.data_ptr()],
+                args=[cuda_int32(tenOut.nelement()), tenOne.data_ptr(), tenTwo.data_ptr(), tenVerone.data_ptr(), tenHorone.data_ptr(), tenVertwo.data_ptr(), tenHortwo.data_ptr(), tenOut.data_ptr()],
                 stream=collections.namedtuple('Stream', 'ptr')(torch.cuda.current_stream().cuda_stream)
             )
+
+        # end
+
+        self.save_for_backward(tenOne, tenTwo, tenVerone, tenHorone, tenVertwo, tenHortwo)
+
+        return tenOut
+    # end
+
+    @staticmethod
+    @torch.cuda.amp.custom_bwd
+    def backward(self, tenOutgrad):
+        tenInputs = [tenSaved.detach().requires_grad_(self.needs_input_grad[intInput]) for intInput, tenSaved in enumerate(self.saved_tensors)]
+
+        with torch.enable_grad():
+            tenOut = reference_sepconv_pair(*tenInputs)
+        # end
+
+        tenGrads = iter(torch.autograd.grad(tenOut, [tenInput for tenInput in tenInputs if tenInput.requires_grad == True], tenOutgrad))
+
+        return tuple([next(tenGrads) if tenInput.requires_grad == True else None for tenInput in tenInputs]) + tuple([None, None])
+    # end
+# end
+
+
+##########################################################
+
+
+if __name__ == '__main__':
+    # verifies the gradients of the cpu implementation numerically, as well as its agreement with the cuda kernels if a gpu is available
+
+    tenIn = torch.rand([2, 3, 6 + 5 - 1, 7 + 5 - 1], dtype=torch.float64, requires_grad=True)
+    tenVer = torch.rand([2, 5, 6, 7], dtype=torch.float64, requires_grad=True)
+    tenHor = torch.rand([2, 5, 6, 7], dtype=torch.float64, requires_grad=True)
+
+    assert(torch.autograd.gradcheck(sepconv_func.apply, tuple([tenIn, tenVer, tenHor])) == True)
+    assert(torch.autograd.gradcheck(sepconv_func.apply, tuple([tenIn, tenVer, tenHor, 5])) == True) # tiles that do not divide the output
+
+    assert(torch.autograd.gradcheck(sepconv_func.apply, tuple([tenIn, tenVer, tenHor, None, 'direct'])) == True)
+    assert(torch.autograd.gradcheck(sepconv_func.apply, tuple([tenIn, tenVer, tenHor, 5, 'separable'])) == True)
+
+    print('cpu gradcheck passed')
+
+    assert(torch.allclose(sepconv_func.apply(tenIn, tenVer, tenHor, None, 'direct'), sepconv_func.apply(tenIn, tenVer, tenHor, 3, 'separable')) == True)
+
+    print('separable matches direct')
+
+    tenOne = torch.rand([2, 3, 6, 7], dtype=torch.float64, requires_grad=True)
+    tenTwo = torch.rand([2, 3, 6, 7], dtype=torch.float64, requires_grad=True)
+    tenVerone, tenHorone, tenVertwo, tenHortwo = [torch.rand([2, 5, 6, 7], dtype=torch.float64, requires_grad=True) for intKernel in range(4)]
+
+    assert(torch.allclose(sepconv_pair_func.apply(tenOne, tenTwo, tenVerone, tenHorone, tenVertwo, tenHortwo, 5), reference_sepconv_pair(tenOne, tenTwo, tenVerone, tenHorone, tenVertwo, tenHortwo)) == True)
+    assert(torch.autograd.gradcheck(sepconv_pair_func.apply, tuple([tenOne, tenTwo, tenVerone, tenHorone, tenVertwo, tenHortwo, 5])) == True) # the numerical gradients of the fused op against the analytical ones of the reference
+
+    print('fused pair matches reference')
+
+    strKernel = '''
+        extern "C" __global__ void __launch_bounds__(512) sepconv_test(
+            const int n,
+            const {{type}}* __restrict__ tenIn,
+            const {{type}}* __restrict__ tenVer,
+            {{type}}* __restrict__ tenOut
+        ) { for (int intIndex = (blockIdx.x * blockDim.x) + threadIdx.x; intIndex < n; intIndex += blockDim.x * gridDim.x) {
+            const int intY = ( intIndex / SIZE_3(tenOut) ) % SIZE_2(tenOut);
+            const int intX = ( intIndex                  ) % SIZE_3(tenOut);
+
+            for (int intFy = 0; intFy < SIZE_1(tenVer); intFy += 1) {
+                tenOut[OFFSET_4(tenOut, 0, 0, intY, intX)] += {{fltScale}} * VALUE_4(tenIn, 0, {intFy % 2}, intY + intFy, intX) * VALUE_4(tenVer, 0, (SIZE_1(tenVer) - 1) - intFy, intY, intX);
+            }
+        } }
+    '''
+
+    for intVer, intHeight, intWidth, objType in [(5, 6, 7, torch.float32), (51, 32, 48, torch.float32), (51, 33, 17, torch.float64), (3, 1, 1, torch.float16)]:
+        objVariables = {
+            'tenIn': torch.zeros([2, 4, intWidth + intVer - 1, intHeight + intVer - 1], dtype=objType).transpose(2, 3), # strides that are not contiguous
+            'tenVer': torch.zeros([2, intVer, intHeight, intWidth], dtype=objType),
+            'tenOut': torch.zeros([2, 4, intHeight, intWidth], dtype=objType),
+            'fltScale': 0.5
+        }
+
+        assert(cuda_expand('sepconv_test', strKernel, objVariables) == cuda_expand_regex(strKernel, objVariables))
+    # end
+
+    print('kernel expansion matches')
+
+    if torch.cuda.is_available() == True:
+        tenIn, tenVer, tenHor = [tenIn.detach().float().requires_grad_(), tenVer.detach().float().requires_grad_(), tenHor.detach().float().requires_grad_()]
+
+        tenOut = sepconv_func.apply(tenIn, tenVer, tenHor)
+        tenGrads = torch.autograd.grad(tenOut.square().sum(), [tenIn, tenVer, tenHor])
+
+        tenCudaout = sepconv_func.apply(tenIn.cuda(), tenVer.cuda(), tenHor.cuda())
+        tenCudagrads = torch.autograd.grad(tenCudaout.square().sum(), [tenIn, tenVer, tenHor])
+
+        assert(torch.allclose(tenOut, tenCudaout.cpu(), rtol=0.0001, atol=0.0001) == True)
+        assert(torch.allclose(tenOut, sepconv_func.apply(tenIn.cuda(), tenVer.cuda(), tenHor.cuda(), None, 'separable').cpu(), rtol=0.0001, atol=0.0001) == True)
+
+        tenPair = [tenPair.detach().float() for tenPair in [tenOne, tenTwo, tenVerone, tenHorone, tenVertwo, tenHortwo]]
+
+        assert(torch.allclose(sepconv_pair_func.apply(*tenPair), sepconv_pair_func.apply(*[tenPair.cuda() for tenPair in tenPair]).cpu(), rtol=0.0001, atol=0.0001) == True)
+
+        for tenGrad, tenCudagrad in zip(tenGrads, tenCudagrads):
+            assert(torch.allclose(tenGrad, tenCudagrad.cpu(), rtol=0.0001, atol=0.0001) == True)
         # end
 
-        return tenIngrad, tenVergrad, tenHorgrad
+        print('cpu and cuda agree')
     # end
 # end